@@ -0,0 +1,333 @@
+"""Headless benchmarks for overlay rendering, layout loading and memory use
+
+Run from the repository root:
+
+    python benchmarks/run_benchmarks.py [--quick] [--output results.json]
+
+Everything runs on the offscreen Qt platform with a throwaway settings folder, so
+it works on machines without a display. Test images and GIFs are generated on the
+fly. Results are written as JSON so runs can be compared over time.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='overlay-bench-settings-')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from PyQt5.QtCore import Qt, QT_VERSION_STR, PYQT_VERSION_STR
+from PyQt5.QtGui import QImage, QPainter, QColor, QLinearGradient
+from PyQt5.QtWidgets import QApplication
+
+import overlay
+
+try:
+    import psutil
+except ImportError:
+    psutil = None
+
+
+def timed(function, repeat):
+    """Median wall time of function in milliseconds"""
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        function()
+        samples.append((time.perf_counter() - start) * 1000)
+    return round(statistics.median(samples), 3)
+
+
+def pump(app, until, timeout=60):
+    """Process events until until() is true"""
+    deadline = time.perf_counter() + timeout
+    while not until():
+        if time.perf_counter() > deadline:
+            raise TimeoutError("benchmark step did not finish")
+        app.processEvents()
+
+
+def resident_bytes():
+    """Resident set size of this process, None where it can't be read"""
+    if psutil is not None:
+        return psutil.Process().memory_info().rss
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def make_image(path, width, height, seed=0):
+    """Write a test photo-like image (gradient plus shapes) so decoders have real work to do"""
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    gradient = QLinearGradient(0, 0, width, height)
+    gradient.setColorAt(0, QColor.fromHsv(seed * 37 % 360, 200, 230))
+    gradient.setColorAt(1, QColor.fromHsv((seed * 37 + 180) % 360, 160, 90))
+    painter.fillRect(image.rect(), gradient)
+    step = max(width // 16, 1)
+    for i in range(16):
+        painter.setBrush(QColor.fromHsv((seed * 53 + i * 23) % 360, 180, 250))
+        painter.drawEllipse(i * step, (i * 7919 % 16) * height // 16, step * 2, step * 2)
+    painter.end()
+    image.save(path, quality=90)
+    return path
+
+
+def lzw_uncompressed(indexes):
+    """GIF LZW stream that stores every pixel as a literal 9-bit code"""
+    clear, end = 256, 257
+    codes = [clear]
+    for i, index in enumerate(indexes):
+        # Reset the table before the decoder would widen its codes past 9 bits
+        if i and i % 250 == 0:
+            codes.append(clear)
+        codes.append(index)
+    codes.append(end)
+    data = bytearray()
+    buffer = bits = 0
+    for code in codes:
+        buffer |= code << bits
+        bits += 9
+        while bits >= 8:
+            data.append(buffer & 0xff)
+            buffer >>= 8
+            bits -= 8
+    if bits:
+        data.append(buffer)
+    blocks = bytearray([8])
+    for start in range(0, len(data), 255):
+        chunk = data[start:start + 255]
+        blocks += bytes([len(chunk)]) + chunk
+    return bytes(blocks + b'\0')
+
+
+def make_gif(path, width, height, frame_count, square=24):
+    """Write an animated GIF of a square moving over a static background"""
+    palette = bytearray()
+    for i in range(256):
+        palette += bytes([(i >> 5) * 36, ((i >> 2) & 7) * 36, (i & 3) * 85])
+    background = [(x * 8 // width) << 5 | (y * 8 // height) << 2 | 1 for y in range(height) for x in range(width)]
+
+    out = bytearray(b'GIF89a')
+    out += width.to_bytes(2, 'little') + height.to_bytes(2, 'little') + bytes([0xf7, 0, 0]) + palette
+    out += b'\x21\xff\x0bNETSCAPE2.0\x03\x01\x00\x00\x00'
+    for frame in range(frame_count):
+        pixels = list(background)
+        left = frame * (width - square) // max(frame_count - 1, 1)
+        top = height // 2 - square // 2
+        for y in range(top, top + square):
+            pixels[y * width + left:y * width + left + square] = [0xe3] * square
+        out += b'\x21\xf9\x04\x04' + (4).to_bytes(2, 'little') + b'\x00\x00'
+        out += b'\x2c' + bytes(4) + width.to_bytes(2, 'little') + height.to_bytes(2, 'little') + b'\x00'
+        out += lzw_uncompressed(pixels)
+    out += b'\x3b'
+    with open(path, 'wb') as f:
+        f.write(out)
+    return path
+
+
+def bench_paint(app, media, sizes, repeat):
+    """Render cost against source size and rotation, with a cold and a warm render cache"""
+    results = []
+    for side in sizes:
+        path = make_image(os.path.join(media, f'paint-{side}.jpg'), side, side * 3 // 4, seed=side)
+        for rotation in (0, 45):
+            window = overlay.OverlayWindow(path, {'width': 400, 'height': 300, 'rotation': rotation})
+            window.show()
+
+            def cold():
+                window.invalidate_render_cache()
+                window.grab()
+
+            results.append({
+                'source': f'{side}x{side * 3 // 4}',
+                'rotation': rotation,
+                'cold_paint_ms': timed(cold, repeat),
+                'cached_paint_ms': timed(window.grab, repeat),
+            })
+            window.close()
+    return results
+
+
+def bench_gif(app, media, frame_count):
+    """Frames per second an animated overlay can step and render, cached and streaming"""
+    path = make_gif(os.path.join(media, 'throughput.gif'), 320, 240, frame_count)
+    results = []
+    for mode in ('cached', 'streaming'):
+        overlay.gif_frame_cache.enabled = mode == 'cached'
+        window = overlay.OverlayWindow(path, {'width': 320, 'height': 240})
+        overlay.animation_clock.unregister(window)
+        window.show()
+        steps = frame_count * 4
+        start = time.perf_counter()
+        for _ in range(steps):
+            window.step_frame()
+            window.on_frame_changed(window.current_frame_number())
+            window.rendered_frame()
+        elapsed = time.perf_counter() - start
+        results.append({
+            'mode': window.frame_cache_state if mode == 'cached' else mode,
+            'frames': steps,
+            'frames_per_second': round(steps / elapsed, 1),
+            'repaint_fraction': round(window.repaint_fraction(), 4),
+        })
+        window.close()
+    overlay.gif_frame_cache.enabled = True
+    return results
+
+
+def bench_layouts(app, controller, media, counts, distinct_images):
+    """load_layout time for growing layouts, cold (nothing decoded) and when reapplied unchanged"""
+    images = [make_image(os.path.join(media, f'layout-{i}.jpg'), 1600, 1200, seed=i) for i in range(distinct_images)]
+    results = []
+    for count in counts:
+        name = f'bench-{count}'
+        entries = [{'file': images[i % len(images)], 'width': 200, 'height': 150,
+                    'position': [(i % 10) * 60, (i // 10) * 45]} for i in range(count)]
+        overlay.write_json_atomic(controller.layout_path(name), {'overlays': entries})
+
+        controller.remove_all()
+        pump(app, lambda: not overlay.image_store.entries)
+        start = time.perf_counter()
+        controller.load_layout(name)
+        pump(app, lambda: controller.pending_layout is None and len(controller.overlays) == count)
+        cold = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        controller.load_layout(name)
+        pump(app, lambda: controller.pending_layout is None)
+        warm = (time.perf_counter() - start) * 1000
+
+        results.append({'overlays': count, 'cold_ms': round(cold, 1), 'reapply_ms': round(warm, 1)})
+    return results
+
+
+def bench_overlay_list(app, controller, repeat):
+    """update_overlay_list cost for the overlays currently loaded, including the view fetching every row"""
+    model = controller.overlayModel
+
+    def refresh():
+        controller.update_overlay_list()
+        for row in range(model.rowCount()):
+            index = model.index(row)
+            for role in (Qt.DisplayRole, Qt.DecorationRole, Qt.ToolTipRole):
+                model.data(index, role)
+
+    return {'overlays': model.rowCount(), 'refresh_ms': timed(refresh, repeat)}
+
+
+def bench_memory(app, controller, media, count):
+    """Resident memory added per overlay, for distinct images and for one image shown many times
+
+    Each case runs in a fresh process, so memory the earlier benchmarks left in the
+    allocator's free lists can't hide what the overlays take.
+    """
+    images = [make_image(os.path.join(media, f'memory-{i}.jpg'), 2048, 1536, seed=100 + i) for i in range(count)]
+    warmup = make_image(os.path.join(media, 'memory-warmup.jpg'), 640, 480, seed=99)
+    results = {}
+    for label, files in (('distinct_images', images), ('shared_image', [images[0]] * count)):
+        output = subprocess.run([sys.executable, os.path.abspath(__file__), '--memory-probe', json.dumps([warmup] + files)],
+                                capture_output=True, text=True, check=True).stdout
+        results[label] = json.loads(output.strip().splitlines()[-1])
+    return results
+
+
+def memory_probe(files):
+    """Child process side of bench_memory: resident memory before and after showing overlays for files[1:]
+
+    files[0] is shown first and not counted, so one-time costs (image plugins, the first
+    backing store) don't end up in the per overlay figure.
+    """
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    overlay.memory_accountant.budget_bytes = 0
+    overlay.disk_frame_cache.enabled = False
+    controller = overlay.MainWindow(startup_backend=overlay.NoStartup())
+    overlay.memory_accountant.budget_bytes = 0
+
+    def show(file, position):
+        window = controller.add_overlay(file, {'width': 300, 'height': 225, 'position': position})
+        # Counted once the window has painted, so the render cache and backing store exist
+        pump(app, lambda: window.render_cache is not None)
+        return window
+
+    show(files[0], [0, 0])
+    before = resident_bytes()
+    for i, file in enumerate(files[1:]):
+        show(file, [i * 10, i * 10])
+    controller.update_visibility()
+    after = resident_bytes()
+    count = len(files) - 1
+    usage = controller.memory_usage()
+    print(json.dumps({
+        'overlays': count,
+        'rss_per_overlay_bytes': (after - before) // count if before is not None and after is not None else None,
+        'accounted_bytes': sum(usage.values()),
+        'accounted': usage,
+    }))
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--output', help="JSON file to write (default: benchmarks/results/<timestamp>.json)")
+    parser.add_argument('--quick', action='store_true', help="smaller sizes and counts, for a fast smoke run")
+    parser.add_argument('--memory-probe', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+    if args.memory_probe:
+        return memory_probe(json.loads(args.memory_probe))
+
+    app = QApplication.instance() or QApplication(sys.argv[:1])
+    # Measure raw costs: no trimming to a budget, no disk cache from earlier runs
+    overlay.memory_accountant.budget_bytes = 0
+    overlay.disk_frame_cache.enabled = False
+    controller = overlay.MainWindow(startup_backend=overlay.NoStartup())
+    overlay.memory_accountant.budget_bytes = 0
+
+    media = tempfile.mkdtemp(prefix='overlay-bench-media-')
+    quick = args.quick
+    results = {}
+    print("paint...")
+    results['paint'] = bench_paint(app, media, (256, 1024) if quick else (256, 1024, 4096), 5 if quick else 20)
+    print("gif throughput...")
+    results['gif'] = bench_gif(app, media, 8 if quick else 24)
+    print("load_layout...")
+    results['load_layout'] = bench_layouts(app, controller, media, (1, 10) if quick else (1, 10, 100), 4 if quick else 10)
+    print("overlay list...")
+    results['overlay_list'] = bench_overlay_list(app, controller, 5 if quick else 20)
+    print("memory...")
+    results['memory'] = bench_memory(app, controller, media, 4 if quick else 20)
+
+    report = {
+        'meta': {
+            'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+            'platform': platform.platform(),
+            'python': platform.python_version(),
+            'qt': QT_VERSION_STR,
+            'pyqt': PYQT_VERSION_STR,
+            'qpa_platform': os.environ['QT_QPA_PLATFORM'],
+            'quick': quick,
+        },
+        'results': results,
+    }
+    output = args.output
+    if output is None:
+        directory = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'results')
+        os.makedirs(directory, exist_ok=True)
+        output = os.path.join(directory, time.strftime('benchmark-%Y%m%d-%H%M%S.json'))
+    with open(output, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(json.dumps(results, indent=2))
+    print(f"Results written to {output}")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
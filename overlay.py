@@ -1,46 +1,1368 @@
 from PyQt5.QtWidgets import (
     QApplication, QWidget, QLabel, QPushButton, QFileDialog, QVBoxLayout, QHBoxLayout,
-    QSlider, QCheckBox, QListWidget, QListWidgetItem, QSystemTrayIcon, QMenu, QAction
+    QSlider, QCheckBox, QListView, QSystemTrayIcon, QMenu, QAction, QActionGroup, QComboBox, QPlainTextEdit
 )
-from PyQt5.QtGui import QPixmap, QMovie, QTransform, QPainter, QIcon
-from PyQt5.QtCore import Qt, QSize, QSharedMemory
+from PyQt5.QtGui import QPixmap, QImage, QMovie, QTransform, QPainter, QIcon, QImageReader, QRegion, QFontDatabase
+from PyQt5.QtCore import (
+    Qt, QSize, QPoint, QRect, QRectF, QSharedMemory, QTimer, QElapsedTimer, QEvent, QAbstractListModel, QModelIndex, QMimeData,
+    QObject, QRunnable, QThreadPool, pyqtSignal, QByteArray, QBuffer, QIODevice
+)
+from PyQt5.QtNetwork import QLocalServer, QLocalSocket
 import sys
 import json
+import math
 import os
-import winreg
+import time
+import itertools
+import bisect
+import base64
+import tempfile
+import hashlib
+import mmap
+import struct
+import threading
+import zlib
+from collections import OrderedDict, deque
+from PyQt5 import sip
+
+try:
+    import winreg
+except ImportError:
+    # Not on Windows: auto-start is unavailable, everything else works
+    winreg = None
+
+# Extra resolution decoded when zooming past the held image, so that every
+# wheel step does not go back to disk
+DECODE_HEADROOM = 1.5
+
+# New overlays are fitted into this many pixels on their longest side
+MAX_INITIAL_SIDE = 350
+
+# How long input has to be idle before an interactive resize/rotate/drag ends
+# and the overlay is re-rendered at full quality
+INTERACTIVE_IDLE_MS = 150
+
+# Animations with more frames than this always stream from a background decoder
+MAX_CACHED_GIF_FRAMES = 300
+
+# Frames a streaming animation decodes ahead of the one on screen
+STREAM_BUFFER_FRAMES = 4
+
+# Largest share of the frame cache budget a single animation may take
+MAX_GIF_BUDGET_SHARE = 0.5
+
+DEFAULT_GIF_CACHE_BUDGET_MB = 256
+
+DEFAULT_DISK_CACHE_LIMIT_MB = 1024
+
+# Decoded pixels the app may hold before it trims caches (0 = no limit)
+DEFAULT_MEMORY_BUDGET_MB = 512
+# Pre-decoded frames younger than this are not dropped for the memory budget, or a
+# resize (which rebuilds them) and the next visibility pass would keep undoing each other
+FRAME_CACHE_MIN_AGE_S = 10
+
+OVERLAY_WINDOW_FLAGS = Qt.FramelessWindowHint | Qt.WindowStaysOnTopHint | Qt.Tool
+
+# Choices for the animation frame rate cap in the tray menu (0 = display refresh rate)
+ANIMATION_FPS_CHOICES = [(0, "Display refresh rate"), (30, "30 fps"), (15, "15 fps (power saver)")]
+
+# Delay used for animation frames that do not specify one
+DEFAULT_FRAME_DELAY_MS = 100
+
+# Delay before overlay visibility is recomputed after a burst of moves/resizes
+VISIBILITY_UPDATE_MS = 50
+
+# Delay before windows are restacked after a burst of clicks or list changes
+ZORDER_UPDATE_MS = 30
+
+# How often list thumbnails of animated overlays are allowed to refresh
+ANIMATED_THUMBNAIL_REFRESH_MS = 1000
+
+THUMBNAIL_SIZE = 60
+
+# The default layout keeps living in overlay_config.json, named ones go to the layouts folder
+DEFAULT_LAYOUT_NAME = "Default"
+# Characters a layout name can't contain, since it becomes a file name
+LAYOUT_NAME_FORBIDDEN = '<>:"/\\|?*'
+
+# Layout files from version 2 on embed a thumbnail of each image; files without
+# a version are the original plain format and still load
+LAYOUT_FORMAT_VERSION = 2
+
+# Local socket the running instance listens on for forwarded launches and scripted commands
+CONTROL_SERVER_NAME = "DesktopOverlayApp"
+CONTROL_TIMEOUT_MS = 3000
+# Largest width or height a control request may give an overlay
+MAX_OVERLAY_SIDE = 16384
+
+# Rapid changes (drag, wheel, slider) are merged into one autosave after this much idle time
+AUTOSAVE_IDLE_MS = 1500
+
+# Upper bounds in ms of the timing histogram buckets, a last bucket takes anything slower
+PERF_HISTOGRAM_BUCKETS_MS = (0.5, 1, 2, 4, 8, 16, 33, 66, 133)
+
+# Setting this environment variable to a file path turns on performance recording
+# and writes the statistics there as JSON every PERF_DUMP_INTERVAL_MS
+PERF_TRACE_ENV = "OVERLAY_PERF_TRACE"
+PERF_DUMP_INTERVAL_MS = 5000
+
+# How often the Performance panel refreshes while it is open
+PERF_PANEL_REFRESH_MS = 1000
+
+
+def pixmap_bytes(pix):
+    """Approximate number of bytes held by a pixmap"""
+    if pix is None or pix.isNull():
+        return 0
+    return pix.width() * pix.height() * max(pix.depth(), 8) // 8
+
+
+def format_bytes(count):
+    """Human readable byte count"""
+    for unit in ('B', 'KB', 'MB'):
+        if count < 1024:
+            return f"{count:.0f} {unit}"
+        count /= 1024
+    return f"{count:.1f} GB"
+
+
+def write_json_atomic(path, data):
+    """Write JSON to a temp file next to path and rename it over path"""
+    fd, temp_path = tempfile.mkstemp(dir=os.path.dirname(path), prefix='.tmp-', suffix='.json')
+    try:
+        with os.fdopen(fd, 'w') as f:
+            json.dump(data, f, indent=2)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(temp_path, path)
+    except BaseException:
+        try:
+            os.remove(temp_path)
+        except OSError:
+            pass
+        raise
+
+
+def encode_thumbnail(pix):
+    """Base64 PNG of a small pixmap for embedding in a layout file"""
+    data = QByteArray()
+    buffer = QBuffer(data)
+    buffer.open(QIODevice.WriteOnly)
+    pix.save(buffer, "PNG")
+    buffer.close()
+    return base64.b64encode(bytes(data)).decode('ascii')
+
+
+def decode_thumbnail(data):
+    """QPixmap from an embedded thumbnail, None if missing or unreadable"""
+    if not data:
+        return None
+    try:
+        pix = QPixmap()
+        if pix.loadFromData(base64.b64decode(data), "PNG"):
+            return pix
+    except ValueError:
+        pass
+    return None
+
+
+def read_scaled_image(path, source, target):
+    """Decode path covering target (never above the source size), safe off the GUI thread"""
+    start = time.perf_counter() if perf_stats.enabled else None
+    reader = QImageReader(path)
+    if source.isValid() and (target.width() < source.width() or target.height() < source.height()):
+        reader.setScaledSize(source.scaled(target, Qt.KeepAspectRatioByExpanding))
+    image = reader.read()
+    if start is not None:
+        perf_stats.record_decode(elapsed_ms(start), image.sizeInBytes())
+    return image, reader.errorString()
+
+
+PNG_SIGNATURE = b'\x89PNG\r\n\x1a\n'
+
+
+def sniff_animation(path):
+    """'gif', 'apng' or 'webp' when the file content is an animation format, None otherwise"""
+    try:
+        with open(path, 'rb') as f:
+            header = f.read(32)
+            if header[:6] in (b'GIF87a', b'GIF89a'):
+                return 'gif'
+            if header[:4] == b'RIFF' and header[8:12] == b'WEBP':
+                # Only the extended format can animate, flagged in its VP8X header
+                if header[12:16] == b'VP8X' and len(header) > 20 and header[20] & 0x02:
+                    return 'webp'
+                return None
+            if header[:8] != PNG_SIGNATURE:
+                return None
+            # An APNG announces itself with an acTL chunk before the image data
+            f.seek(8)
+            while True:
+                head = f.read(8)
+                if len(head) < 8:
+                    return None
+                length, kind = struct.unpack('>I4s', head)
+                if kind == b'acTL':
+                    return 'apng'
+                if kind in (b'IDAT', b'IEND'):
+                    return None
+                f.seek(length + 4, os.SEEK_CUR)
+    except OSError:
+        return None
+
+
+def png_chunk(kind, data):
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+class QtAnimationReader:
+    """Frames of a GIF or animated WebP through Qt's image plugins, safe off the GUI thread"""
+
+    def __init__(self, path):
+        self.path = path
+        # Frames are decoded straight to this size when it is valid
+        self.scaled_size = QSize()
+        self.reader = QImageReader(path)
+        self.size = self.reader.size()
+        self.frame_count = max(self.reader.imageCount(), 1)
+        self.loop_count = self.reader.loopCount()
+
+    def read(self):
+        """(image, delay in ms) of the next frame, None after the last one"""
+        self.reader.setScaledSize(self.scaled_size)
+        image = self.reader.read()
+        if image.isNull():
+            return None
+        delay = self.reader.nextImageDelay()
+        return image, delay if delay > 0 else DEFAULT_FRAME_DELAY_MS
+
+    def rewind(self):
+        self.reader = QImageReader(self.path)
+
+
+class ApngReader:
+    """Frames of an animated PNG, composed from its fcTL/fdAT chunks (Qt only decodes the default image)
+
+    Each frame's data is wrapped into a small standalone PNG for Qt to decode and then
+    drawn onto the canvas with the frame's blend and dispose operations.
+    """
+
+    # Chunks every frame needs to decode like the default image does
+    SHARED_CHUNKS = (b'PLTE', b'tRNS', b'gAMA', b'cHRM', b'sRGB', b'iCCP', b'sBIT')
+
+    def __init__(self, path):
+        self.path = path
+        self.scaled_size = QSize()
+        self.header = None
+        self.shared = b''
+        self.frames = []
+        self.loop_count = -1
+        self.parse()
+        self.size = QSize(*struct.unpack('>II', self.header[:8]))
+        self.frame_count = len(self.frames)
+        self.rewind()
+
+    def parse(self):
+        """Read the chunk layout, frame data is only located here and read when the frame is due"""
+        frame = None
+        with open(self.path, 'rb') as f:
+            if f.read(8) != PNG_SIGNATURE:
+                raise ValueError(f"{self.path} is not a PNG file")
+            while True:
+                head = f.read(8)
+                if len(head) < 8:
+                    break
+                length, kind = struct.unpack('>I4s', head)
+                if kind in (b'IDAT', b'fdAT'):
+                    # fdAT starts with a sequence number, IDAT before the first fcTL is a
+                    # default image that is not part of the animation
+                    skip = 4 if kind == b'fdAT' else 0
+                    if frame is not None:
+                        frame['data'].append((f.tell() + skip, length - skip))
+                    f.seek(length + 4, os.SEEK_CUR)
+                    continue
+                data = f.read(length)
+                f.seek(4, os.SEEK_CUR)
+                if kind == b'IHDR':
+                    self.header = data
+                elif kind == b'acTL':
+                    plays = struct.unpack('>II', data)[1]
+                    self.loop_count = plays - 1 if plays else -1
+                elif kind == b'fcTL':
+                    _, width, height, x, y, delay_num, delay_den, dispose, blend = struct.unpack('>IIIIIHHBB', data)
+                    delay = delay_num * 1000 // (delay_den or 100)
+                    frame = {'rect': QRect(x, y, width, height), 'dispose': dispose, 'blend': blend, 'data': [],
+                             'delay': delay if delay > 0 else DEFAULT_FRAME_DELAY_MS}
+                    self.frames.append(frame)
+                elif kind in self.SHARED_CHUNKS:
+                    self.shared += png_chunk(kind, data)
+                elif kind == b'IEND':
+                    break
+        if self.header is None or not self.frames:
+            raise ValueError(f"{self.path} has no animation frames")
+
+    def read(self):
+        """(image, delay in ms) of the next frame, None after the last one"""
+        if self.index >= len(self.frames):
+            return None
+        frame = self.frames[self.index]
+        rect = frame['rect']
+        with open(self.path, 'rb') as f:
+            parts = []
+            for offset, length in frame['data']:
+                f.seek(offset)
+                parts.append(f.read(length))
+        png = (PNG_SIGNATURE + png_chunk(b'IHDR', struct.pack('>II', rect.width(), rect.height()) + self.header[8:])
+               + self.shared + png_chunk(b'IDAT', b''.join(parts)) + png_chunk(b'IEND', b''))
+        image = QImage.fromData(png, 'PNG')
+        if image.isNull():
+            return None
+
+        # Undo the previous frame as its dispose operation asks: clear it, or restore what was under it
+        if self.disposal is not None:
+            area, saved = self.disposal
+            painter = QPainter(self.canvas)
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+            if saved is None:
+                painter.fillRect(area, Qt.transparent)
+            else:
+                painter.drawImage(area.topLeft(), saved)
+            painter.end()
+        dispose = frame['dispose']
+        if dispose == 2 and self.index == 0:
+            dispose = 1
+        self.disposal = (rect, self.canvas.copy(rect) if dispose == 2 else None) if dispose else None
+
+        painter = QPainter(self.canvas)
+        if frame['blend'] == 0:
+            painter.setCompositionMode(QPainter.CompositionMode_Source)
+        painter.drawImage(rect.topLeft(), image)
+        painter.end()
+        self.index += 1
+
+        result = self.canvas.copy()
+        if self.scaled_size.isValid():
+            result = result.scaled(self.scaled_size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+        return result, frame['delay']
+
+    def rewind(self):
+        self.canvas = QImage(self.size, QImage.Format_ARGB32_Premultiplied)
+        self.canvas.fill(Qt.transparent)
+        self.index = 0
+        self.disposal = None
+
+
+def open_animation(path):
+    """Frame reader for an animated image chosen by its content, raises ValueError if it can't be read"""
+    reader = ApngReader(path) if sniff_animation(path) == 'apng' else QtAnimationReader(path)
+    if reader.size.isEmpty():
+        raise ValueError(f"Cannot read {path}: {QImageReader(path).errorString()}")
+    return reader
+
+
+def plan_frame_cache(path, width, height):
+    """Frame size, frame count and bytes needed to pre-decode an animation, None if it should stream"""
+    if not gif_frame_cache.enabled:
+        return None
+    reader = open_animation(path)
+    count = reader.frame_count
+    size = reader.size.scaled(width, height, Qt.KeepAspectRatio)
+    needed = count * size.width() * size.height() * 4
+    # Frames mapped from the disk cache live in the page cache, not in the in-memory budget
+    budget = disk_frame_cache.limit_bytes if disk_frame_cache.enabled else gif_frame_cache.budget_bytes
+    if count <= 1 or count > MAX_CACHED_GIF_FRAMES or needed > budget * MAX_GIF_BUDGET_SHARE:
+        return None
+    return size, count, needed
+
+
+def read_animation_frames(path, size, count):
+    """Decode up to count animation frames scaled to size, safe off the GUI thread"""
+    start = time.perf_counter() if perf_stats.enabled else None
+    reader = open_animation(path)
+    reader.scaled_size = size
+    frames = []
+    delays = []
+    while len(frames) < count:
+        frame = reader.read()
+        if frame is None:
+            break
+        frames.append(frame[0])
+        delays.append(frame[1])
+    if start is not None:
+        perf_stats.record_decode(elapsed_ms(start), sum(frame.sizeInBytes() for frame in frames))
+    return frames, delays
+
+
+def image_bytes(image):
+    """Raw premultiplied ARGB32 pixels of a QImage and its bytes per line"""
+    if image.format() != QImage.Format_ARGB32_Premultiplied:
+        image = image.convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    return image.constBits().asstring(image.sizeInBytes()), image.bytesPerLine()
+
+
+def changed_rect(previous, current):
+    """Bounding rectangle of the pixels that differ between two frames, empty if none do"""
+    if previous is None or previous.size() != current.size():
+        return current.rect()
+    old, stride = image_bytes(previous)
+    new, _ = image_bytes(current)
+    if old == new:
+        return QRect()
+    width, height = current.width(), current.height()
+    row_bytes = width * 4
+
+    def same(y, start, end):
+        offset = y * stride
+        return old[offset + start:offset + end] == new[offset + start:offset + end]
+
+    top = next(y for y in range(height) if not same(y, 0, row_bytes))
+    bottom = next(y for y in reversed(range(height)) if not same(y, 0, row_bytes))
+    band = range(top, bottom + 1)
+
+    def widest_margin(unchanged):
+        # Largest n for which unchanged(n) holds on every changed row, by bisection
+        low, high = 0, width
+        while low < high:
+            middle = (low + high + 1) // 2
+            if all(unchanged(y, middle) for y in band):
+                low = middle
+            else:
+                high = middle - 1
+        return low
+
+    left = widest_margin(lambda y, n: same(y, 0, n * 4))
+    right = widest_margin(lambda y, n: same(y, row_bytes - n * 4, row_bytes))
+    return QRect(left, top, width - left - right, bottom - top + 1)
+
+
+def frame_change_rects(frames):
+    """For each frame, the area that changed since the frame before it (wrapping around)"""
+    return [changed_rect(frames[i - 1], frame) for i, frame in enumerate(frames)]
+
+
+def load_animation_frames(path, size, count):
+    """Frames, delays and backing mapping for an animation, from the disk cache when possible
+
+    The mapping is None when the frames are ordinary in-memory QImages. Frames and delays
+    are None too when the animation could not be cached on disk and is too big for the
+    in-memory budget, it should stream then.
+    """
+    cached = disk_frame_cache.load(path, size)
+    if cached is not None:
+        return cached
+    if disk_frame_cache.enabled:
+        cached = disk_frame_cache.store(path, size, count)
+        if cached is not None:
+            return cached
+    # Plans for the disk cache may be larger than the in-memory budget allows
+    if count * size.width() * size.height() * 4 > gif_frame_cache.budget_bytes * MAX_GIF_BUDGET_SHARE:
+        return None, None, None
+    frames, delays = read_animation_frames(path, size, count)
+    return frames, delays, None
+
+
+def new_window_pixel_ratio():
+    """Device pixel ratio an overlay window reports until it is shown"""
+    # Before a widget has a native window Qt gives it the application's ratio, the
+    # highest of all screens; decodes sized with it match what the window asks for
+    return QApplication.instance().devicePixelRatio()
+
+
+def decode_overlay_source(path, config, ratio=1.0):
+    """Decode what an overlay needs to appear, run on a worker thread (QImage only, no QPixmap)
+
+    ratio is the device pixel ratio the overlay will be rendered at.
+    """
+    source = QImageReader(path).size()
+    if not source.isValid():
+        return {'error': QImageReader(path).errorString()}
+    fit = source.scaled(MAX_INITIAL_SIDE, MAX_INITIAL_SIDE, Qt.KeepAspectRatio).boundedTo(source)
+    size = QSize(config.get('width', fit.width()), config.get('height', fit.height())) * ratio
+    width, height = size.width(), size.height()
+
+    if sniff_animation(path):
+        plan = plan_frame_cache(path, width, height)
+        if plan is None:
+            return {}
+        frames, delays, mapping = load_animation_frames(path, plan[0], plan[1])
+        if frames is None:
+            return {}
+        return {'frame_size': plan[0], 'frames': frames, 'delays': delays, 'mapping': mapping,
+                'changes': frame_change_rects(frames)}
+
+    image, error = read_scaled_image(path, source, QSize(width, height).expandedTo(fit))
+    if image.isNull():
+        return {'error': error}
+    return {'image': image}
+
+
+class DecodeSignals(QObject):
+    finished = pyqtSignal(int, int, object)
+
+
+class DecodeTask(QRunnable):
+    """Decode one layout entry on the thread pool and hand the QImages back to the GUI thread"""
+
+    def __init__(self, generation, slot, path, config, signals, ratio=1.0):
+        super().__init__()
+        self.generation = generation
+        self.slot = slot
+        self.path = path
+        self.config = config
+        self.signals = signals
+        self.ratio = ratio
+
+    def run(self):
+        try:
+            result = decode_overlay_source(self.path, self.config, self.ratio)
+        except Exception as e:
+            result = {'error': str(e)}
+        self.signals.finished.emit(self.generation, self.slot, result)
+
+
+class StreamFrame:
+    def __init__(self, number, image, delay, change):
+        self.number = number
+        self.image = image
+        self.delay = delay
+        # Area that differs from the frame decoded before it
+        self.change = change
+
+
+class FrameStream:
+    """Background decoder that keeps a few display sized frames ready ahead of the playhead
+
+    A worker thread decodes, scales and diffs the next frames while the GUI thread only
+    takes finished ones, so a slow frame never holds up painting or other overlays. At
+    most STREAM_BUFFER_FRAMES frames are buffered whatever the animation length.
+    """
+
+    def __init__(self, path, size, start=0, loops_played=0):
+        self.path = path
+        self.size = size
+        self.condition = threading.Condition()
+        self.buffer = deque()
+        # Frames the worker decodes and throws away, used to start or resume mid-animation
+        self.skip_count = start
+        self.loops_played = loops_played
+        self.ended = False
+        self.stopped = False
+        self.thread = threading.Thread(target=self.run, name=f"decode {os.path.basename(path)}", daemon=True)
+        self.thread.start()
+
+    def run(self):
+        try:
+            reader = open_animation(self.path)
+        except Exception as e:
+            print(f"Error decoding {self.path}: {e}")
+            reader = None
+        number = 0
+        previous = None
+        while reader is not None:
+            with self.condition:
+                while not self.stopped and not self.skip_count and len(self.buffer) >= STREAM_BUFFER_FRAMES:
+                    self.condition.wait()
+                if self.stopped:
+                    return
+                skipping = self.skip_count > 0
+                if not skipping:
+                    reader.scaled_size = reader.size.scaled(self.size, Qt.KeepAspectRatio)
+            start = time.perf_counter() if perf_stats.enabled and not skipping else None
+            frame = reader.read()
+            if frame is None:
+                # A single frame has nothing to loop, otherwise start over until the loops are played
+                self.loops_played += 1
+                if number <= 1 or 0 <= reader.loop_count < self.loops_played:
+                    break
+                reader.rewind()
+                number = 0
+                continue
+
+            with self.condition:
+                skipping = self.skip_count > 0
+                if skipping:
+                    self.skip_count -= 1
+            if skipping:
+                previous = None
+                number += 1
+                continue
+            image = frame[0].convertToFormat(QImage.Format_ARGB32_Premultiplied)
+            change = changed_rect(previous, image)
+            previous = image
+            if start is not None:
+                perf_stats.record_decode(elapsed_ms(start), image.sizeInBytes())
+            with self.condition:
+                if self.stopped:
+                    return
+                if self.skip_count:
+                    # A skip came in while this frame was decoding
+                    self.skip_count -= 1
+                    previous = None
+                else:
+                    self.buffer.append(StreamFrame(number, image, frame[1], change))
+                    self.condition.notify_all()
+            number += 1
+        with self.condition:
+            self.ended = True
+            self.condition.notify_all()
+
+    def ready(self):
+        """True if take() would not have to wait"""
+        with self.condition:
+            return bool(self.buffer) or self.ended
+
+    def take(self, wait=False):
+        """Next decoded frame, None once the animation ended (or if not ready and not waiting)"""
+        with self.condition:
+            while wait and not self.buffer and not self.ended and not self.stopped:
+                self.condition.wait()
+            if not self.buffer:
+                return None
+            frame = self.buffer.popleft()
+            self.condition.notify_all()
+            return frame
+
+    def skip(self, count):
+        """Drop the next count frames, buffered ones first"""
+        with self.condition:
+            while count and self.buffer:
+                self.buffer.popleft()
+                count -= 1
+            self.skip_count += count
+            self.condition.notify_all()
+
+    def set_size(self, size):
+        """Decode upcoming frames at a new display size"""
+        with self.condition:
+            self.size = size
+
+    def stop(self):
+        with self.condition:
+            self.stopped = True
+            self.buffer.clear()
+            self.condition.notify_all()
+
+    def bytes_held(self):
+        with self.condition:
+            return sum(frame.image.sizeInBytes() for frame in self.buffer)
+
+
+class GifFrameCache:
+    """Global byte budget for pre-decoded GIF frames, evicting the least recently played overlay"""
+
+    def __init__(self, budget_bytes=DEFAULT_GIF_CACHE_BUDGET_MB * 1024 * 1024):
+        self.enabled = True
+        self.budget_bytes = budget_bytes
+        self.entries = OrderedDict()
+
+    def bytes_used(self):
+        return sum(self.entries.values())
+
+    def reserve(self, overlay, size):
+        """Make room for size bytes owned by overlay, returns False if it should stream instead"""
+        self.release(overlay)
+        if not self.enabled or size > self.budget_bytes * MAX_GIF_BUDGET_SHARE:
+            return False
+        self.evict_until(self.budget_bytes - size)
+        self.entries[overlay] = size
+        return True
+
+    def touch(self, overlay):
+        """Mark overlay as most recently played"""
+        if overlay in self.entries:
+            self.entries.move_to_end(overlay)
+
+    def release(self, overlay):
+        self.entries.pop(overlay, None)
+
+    def set_budget(self, budget_bytes):
+        self.budget_bytes = budget_bytes
+        self.evict_until(budget_bytes)
+
+    def evict_until(self, limit):
+        while self.entries and self.bytes_used() > limit:
+            victim, _ = self.entries.popitem(last=False)
+            victim.drop_frame_cache()
+
+
+gif_frame_cache = GifFrameCache()
+
+
+class DiskFrameCache:
+    """Decoded, display sized GIF frames kept in memory-mapped files across launches
+
+    Files are keyed by source path, modification time and frame size, so an edited GIF or
+    a new overlay size simply misses. Frames are QImages pointing straight into the mapping;
+    the OS page cache shares and evicts them, and the directory is trimmed to limit_bytes
+    by removing the least recently used files.
+    """
+
+    MAGIC = b'OVFC'
+    VERSION = 1
+    HEADER = struct.Struct('<4sIIII')  # magic, version, width, height, frame count
+    ALIGN = 64
+
+    def __init__(self, limit_bytes=DEFAULT_DISK_CACHE_LIMIT_MB * 1024 * 1024):
+        self.enabled = False
+        self.directory = None
+        self.limit_bytes = limit_bytes
+        self.hits = 0
+        self.misses = 0
+
+    def set_directory(self, directory):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+
+    def path_for(self, source_path, size):
+        try:
+            stat = os.stat(source_path)
+        except OSError:
+            return None
+        key = f"{os.path.abspath(source_path)}|{stat.st_mtime_ns}|{stat.st_size}|{size.width()}x{size.height()}"
+        return os.path.join(self.directory, hashlib.sha1(key.encode('utf-8')).hexdigest() + '.frames')
+
+    def data_offset(self, count):
+        end = self.HEADER.size + 4 * count
+        return (end + self.ALIGN - 1) // self.ALIGN * self.ALIGN
+
+    def load(self, source_path, size):
+        """(frames, delays, mapping) for a cached GIF, None on a miss"""
+        if not self.enabled or self.directory is None:
+            return None
+        path = self.path_for(source_path, size)
+        if path is None or not os.path.exists(path):
+            self.misses += 1
+            return None
+        try:
+            with open(path, 'rb') as f:
+                mapping = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+            magic, version, width, height, count = self.HEADER.unpack_from(mapping, 0)
+            frame_bytes = width * height * 4
+            offset = self.data_offset(count)
+            if (magic != self.MAGIC or version != self.VERSION or (width, height) != (size.width(), size.height())
+                    or len(mapping) != offset + count * frame_bytes):
+                raise ValueError("unexpected cache file layout")
+            delays = list(struct.unpack_from(f'<{count}I', mapping, self.HEADER.size))
+            address = int(sip.voidptr(mapping))
+            frames = [QImage(sip.voidptr(address + offset + i * frame_bytes), width, height, width * 4,
+                             QImage.Format_ARGB32_Premultiplied) for i in range(count)]
+            # Bump the modification time so trim() treats the file as recently used
+            os.utime(path)
+        except (OSError, ValueError, struct.error) as e:
+            print(f"Discarding frame cache file {path}: {e}")
+            self.remove(path)
+            self.misses += 1
+            return None
+        self.hits += 1
+        return frames, delays, mapping
+
+    def store(self, source_path, size, count):
+        """Decode count frames of source_path at size into the cache and return them mapped like load()
+
+        Each frame is written out as soon as it is decoded, so however large the animation
+        only one frame is held in memory. None if that failed.
+        """
+        if not self.enabled or self.directory is None:
+            return None
+        path = self.path_for(source_path, size)
+        if path is None:
+            return None
+        start = time.perf_counter() if perf_stats.enabled else None
+        width, height = size.width(), size.height()
+        try:
+            fd, temp_path = tempfile.mkstemp(dir=self.directory, prefix='.tmp-', suffix='.frames')
+        except OSError as e:
+            print(f"Error writing frame cache file for {source_path}: {e}")
+            return None
+        try:
+            with os.fdopen(fd, 'wb') as f:
+                # Header and delays are filled in once every frame has been read
+                f.write(b'\0' * self.data_offset(count))
+                reader = open_animation(source_path)
+                reader.scaled_size = size
+                delays = []
+                while len(delays) < count:
+                    frame = reader.read()
+                    if frame is None:
+                        break
+                    image = frame[0].convertToFormat(QImage.Format_ARGB32_Premultiplied)
+                    if image.size() != size:
+                        image = image.scaled(size, Qt.IgnoreAspectRatio, Qt.SmoothTransformation)
+                    f.write(image.constBits().asstring(image.sizeInBytes()))
+                    delays.append(frame[1])
+                if len(delays) != count:
+                    raise ValueError(f"expected {count} frames, decoded {len(delays)}")
+                f.seek(0)
+                f.write(self.HEADER.pack(self.MAGIC, self.VERSION, width, height, count))
+                f.write(struct.pack(f'<{count}I', *delays))
+            os.replace(temp_path, path)
+        except (OSError, ValueError) as e:
+            print(f"Error writing frame cache file for {source_path}: {e}")
+            self.remove(temp_path)
+            return None
+        if start is not None:
+            perf_stats.record_decode(elapsed_ms(start), count * width * height * 4)
+        self.trim()
+        return self.load(source_path, size)
+
+    def entries(self):
+        """(mtime, bytes, path) of every cache file"""
+        entries = []
+        if self.directory is None:
+            return entries
+        for name in os.listdir(self.directory):
+            if not name.endswith('.frames') or name.startswith('.tmp-'):
+                continue
+            path = os.path.join(self.directory, name)
+            try:
+                stat = os.stat(path)
+            except OSError:
+                continue
+            entries.append((stat.st_mtime_ns, stat.st_size, path))
+        return entries
+
+    def bytes_used(self):
+        return sum(size for _, size, _ in self.entries())
+
+    def remove(self, path):
+        """Delete a cache file, files still mapped elsewhere may refuse on Windows"""
+        try:
+            os.remove(path)
+            return True
+        except OSError:
+            return False
+
+    def trim(self, limit=None):
+        """Remove the least recently used files until the cache fits limit bytes"""
+        limit = self.limit_bytes if limit is None else limit
+        entries = sorted(self.entries())
+        used = sum(size for _, size, _ in entries)
+        for _, size, path in entries:
+            if used <= limit:
+                break
+            if self.remove(path):
+                used -= size
+        return used
+
+    def clear(self):
+        """Remove every cache file that is not in use, returns the bytes that remain"""
+        return self.trim(0)
+
+
+disk_frame_cache = DiskFrameCache()
+
+
+class AnimationClock:
+    """Single timer that advances every animated overlay and repaints them in one pass per tick"""
+
+    def __init__(self):
+        self.overlays = []
+        self.fps_cap = 0
+        self.timer = None
+        self.elapsed = QElapsedTimer()
+        self.elapsed.start()
+
+    def now(self):
+        return self.elapsed.elapsed()
+
+    def register(self, overlay):
+        if overlay not in self.overlays:
+            self.overlays.append(overlay)
+        self.restart()
+
+    def unregister(self, overlay):
+        if overlay in self.overlays:
+            self.overlays.remove(overlay)
+        self.restart()
+
+    def set_fps_cap(self, fps):
+        """Limit animation ticks to fps frames per second, 0 follows the display refresh rate"""
+        self.fps_cap = fps
+        self.restart()
+
+    def tick_interval(self):
+        screen = QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen else 0
+        if rate <= 0:
+            rate = 60
+        if self.fps_cap:
+            rate = min(rate, self.fps_cap)
+        return max(1, round(1000 / rate))
+
+    def restart(self):
+        if not self.overlays:
+            if self.timer is not None:
+                self.timer.stop()
+            return
+        if self.timer is None:
+            self.timer = QTimer()
+            self.timer.setTimerType(Qt.PreciseTimer)
+            self.timer.timeout.connect(self.tick)
+        interval = self.tick_interval()
+        if not self.timer.isActive() or self.timer.interval() != interval:
+            self.timer.start(interval)
+
+    def tick(self):
+        now = self.now()
+        if perf_stats.enabled:
+            changed = []
+            for overlay in list(self.overlays):
+                start = time.perf_counter()
+                if overlay.advance_animation(now):
+                    overlay.frame_timings.record(elapsed_ms(start))
+                    changed.append(overlay)
+        else:
+            changed = [overlay for overlay in list(self.overlays) if overlay.advance_animation(now)]
+        for overlay in changed:
+            overlay.on_frame_changed(overlay.current_frame_number())
+
+
+animation_clock = AnimationClock()
+
+
+class MipmapPyramid:
+    """Power-of-two downsampled levels of a source pixmap, built on demand"""
+
+    def __init__(self, base):
+        self.levels = [base]
+
+    def level_for(self, width, height):
+        """Return the smallest level that is still at least width x height"""
+        index = 0
+        level = self.levels[0]
+        while True:
+            half_w, half_h = level.width() // 2, level.height() // 2
+            if half_w < max(width, 1) or half_h < max(height, 1):
+                return level
+            index += 1
+            if index == len(self.levels):
+                self.levels.append(level.scaled(half_w, half_h, Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+            level = self.levels[index]
+
+    def bytes_held(self):
+        return sum(pixmap_bytes(level) for level in self.levels)
+
+
+class ImageEntry:
+    def __init__(self, path):
+        self.path = path
+        self.refs = 0
+        self.source_size = QImageReader(path).size()
+        self.pyramid = None
+        self.derived = {}
+
+
+class ImageStore:
+    """Process-wide, reference-counted decoded images keyed by path, mtime and file size"""
+
+    def __init__(self):
+        self.entries = {}
+        self.decode_count = 0
+
+    def key_for(self, path):
+        path = os.path.normcase(os.path.abspath(path))
+        try:
+            stat = os.stat(path)
+        except OSError:
+            return (path, 0, 0)
+        return (path, stat.st_mtime_ns, stat.st_size)
+
+    def acquire(self, path, image=None):
+        """Take a reference on the image at path and return its store key
+
+        image is an already decoded QImage (e.g. from a worker thread) the entry can use
+        instead of decoding the file again.
+        """
+        key = self.key_for(path)
+        entry = self.entries.get(key)
+        if entry is None:
+            entry = self.entries[key] = ImageEntry(path)
+        entry.refs += 1
+        self.offer(key, image)
+        return key
+
+    def offer(self, key, image):
+        """Use an already decoded QImage for key if it is sharper than what the entry holds"""
+        entry = self.entries.get(key)
+        if entry is None or image is None or image.isNull():
+            return
+        base = entry.pyramid.levels[0] if entry.pyramid else None
+        if base is None or image.width() > base.width():
+            entry.pyramid = MipmapPyramid(QPixmap.fromImage(image))
+            entry.derived.clear()
+
+    def release(self, key):
+        """Drop a reference, the decoded pixels go away with the last one"""
+        entry = self.entries.get(key)
+        if entry is None:
+            return
+        entry.refs -= 1
+        if entry.refs <= 0:
+            del self.entries[key]
+
+    def source_size(self, key):
+        return self.entries[key].source_size
+
+    def pyramid(self, key, width, height):
+        """Mipmap pyramid whose base is at least width x height (or the full source)"""
+        entry = self.entries[key]
+        base = entry.pyramid.levels[0] if entry.pyramid else None
+        if base is not None and (base.size() == entry.source_size or
+                                 (width <= base.width() and height <= base.height())):
+            return entry.pyramid
+
+        # Decode at least the default display size so previews, thumbnails and
+        # a freshly added overlay all come from one decode
+        source = entry.source_size
+        target = QSize(width, height).expandedTo(source.scaled(MAX_INITIAL_SIDE, MAX_INITIAL_SIDE, Qt.KeepAspectRatio))
+        image, error = read_scaled_image(entry.path, source, target)
+        self.decode_count += 1
+        if image.isNull():
+            print(f"Error decoding {entry.path}: {error}")
+            if entry.pyramid is None:
+                pix = QPixmap(source)
+                pix.fill(Qt.transparent)
+                entry.pyramid = MipmapPyramid(pix)
+            return entry.pyramid
+
+        entry.pyramid = MipmapPyramid(QPixmap.fromImage(image))
+        entry.derived.clear()
+        return entry.pyramid
+
+    def shrink(self, key, width, height):
+        """Replace a larger decode of key by a copy that just covers width x height, returns the pyramid"""
+        entry = self.entries[key]
+        if entry.pyramid is None:
+            return self.pyramid(key, width, height)
+        base = entry.pyramid.levels[0]
+        target = base.size().scaled(width, height, Qt.KeepAspectRatioByExpanding)
+        if target.width() >= base.width():
+            return entry.pyramid
+        level = entry.pyramid.level_for(target.width(), target.height())
+        entry.pyramid = MipmapPyramid(level.scaled(target, Qt.IgnoreAspectRatio, Qt.SmoothTransformation))
+        entry.derived.clear()
+        return entry.pyramid
+
+    def bytes_held(self):
+        """Bytes of every decoded image and derived copy in the store"""
+        total = 0
+        for entry in self.entries.values():
+            if entry.pyramid is not None:
+                total += entry.pyramid.bytes_held()
+            total += sum(pixmap_bytes(pix) for pix in entry.derived.values())
+        return total
+
+    def has_decoded(self, path, width, height):
+        """True if path is already decoded at least at width x height"""
+        entry = self.entries.get(self.key_for(path))
+        if entry is None or entry.pyramid is None:
+            return False
+        base = entry.pyramid.levels[0]
+        return base.size() == entry.source_size or (width <= base.width() and height <= base.height())
+
+    def scaled(self, key, width, height):
+        """Smoothly scaled copy fitting width x height, cached for previews and list thumbnails"""
+        entry = self.entries[key]
+        pix = entry.derived.get((width, height))
+        if pix is None:
+            level = self.pyramid(key, width, height).level_for(width, height)
+            pix = entry.derived[(width, height)] = level.scaled(width, height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return pix
+
+
+image_store = ImageStore()
+
+
+class MemoryAccountant:
+    """Tracks decoded pixel bytes per cache and trims the least recently used overlays to a budget"""
+
+    def __init__(self, budget_bytes=DEFAULT_MEMORY_BUDGET_MB * 1024 * 1024):
+        self.budget_bytes = budget_bytes
+        self.trims = 0
+
+    def usage(self, overlays, model=None, preview=None):
+        """Bytes held per cache"""
+        usage = {
+            'images': image_store.bytes_held(),
+            'render caches': sum(pixmap_bytes(overlay.render_cache) for overlay in overlays),
+            'animation frames': gif_frame_cache.bytes_used(),
+            'animation streams': sum(overlay.stream_bytes() for overlay in overlays
+                               if overlay.isAnimated and overlay.frames is None),
+        }
+        if model is not None:
+            usage['thumbnails'] = len(model.thumbnails) * THUMBNAIL_SIZE * THUMBNAIL_SIZE * 4
+        if preview is not None and preview.movie() is not None:
+            usage['preview'] = pixmap_bytes(preview.movie().currentPixmap())
+        return usage
+
+    def over_budget(self, overlays, model=None, preview=None):
+        return bool(self.budget_bytes) and sum(self.usage(overlays, model, preview).values()) > self.budget_bytes
+
+    def enforce(self, overlays, model=None, preview=None):
+        """Trim until usage fits the budget, returns the bytes freed
+
+        Full resolution sources are replaced by display sized copies first, pre-decoded GIF
+        frames go after that; both start with the overlay the user touched longest ago and
+        are decoded again when an overlay needs them. Frames mapped from the disk cache are
+        left alone, they are not counted and dropping them frees nothing, and so are frames
+        built less than FRAME_CACHE_MIN_AGE_S ago.
+        """
+        if not self.budget_bytes:
+            return 0
+        start = used = sum(self.usage(overlays, model, preview).values())
+        if used <= self.budget_bytes:
+            return 0
+
+        # Overlays sharing an image need it at the largest of their sizes
+        needed = {}
+        for overlay in overlays:
+            if not overlay.isAnimated:
+                size = needed.get(overlay.image_key, QSize())
+                needed[overlay.image_key] = size.expandedTo(overlay.device_size())
+
+        by_age = sorted(overlays, key=lambda overlay: overlay.last_interaction)
+        for trim in ('sources', 'frames'):
+            for overlay in by_age:
+                if used <= self.budget_bytes:
+                    break
+                if trim == 'sources' and not overlay.isAnimated:
+                    if not overlay.trim_source(needed[overlay.image_key]):
+                        continue
+                elif (trim == 'frames' and overlay.isAnimated and overlay.frames is not None
+                      and overlay.frame_mapping is None
+                      and time.monotonic() - overlay.frame_cache_built >= FRAME_CACHE_MIN_AGE_S):
+                    overlay.drop_frame_cache()
+                else:
+                    continue
+                self.trims += 1
+                used = sum(self.usage(overlays, model, preview).values())
+        return start - used
+
+
+memory_accountant = MemoryAccountant()
+
+
+def elapsed_ms(start):
+    """Milliseconds since a time.perf_counter() reading"""
+    return (time.perf_counter() - start) * 1000
+
+
+class TimingHistogram:
+    """Count, total, worst case and bucketed distribution of durations in milliseconds"""
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.count = 0
+        self.total_ms = 0.0
+        self.max_ms = 0.0
+        self.buckets = [0] * (len(PERF_HISTOGRAM_BUCKETS_MS) + 1)
+
+    def record(self, ms):
+        self.count += 1
+        self.total_ms += ms
+        self.max_ms = max(self.max_ms, ms)
+        self.buckets[bisect.bisect_left(PERF_HISTOGRAM_BUCKETS_MS, ms)] += 1
+
+    def mean_ms(self):
+        return self.total_ms / self.count if self.count else 0.0
+
+    def percentile_ms(self, fraction):
+        """Upper bound of the bucket holding the given fraction of samples (the maximum for the last one)"""
+        wanted = fraction * self.count
+        seen = 0
+        for bound, count in zip(PERF_HISTOGRAM_BUCKETS_MS, self.buckets):
+            seen += count
+            if count and seen >= wanted:
+                return min(bound, self.max_ms)
+        return self.max_ms
+
+    def summary(self):
+        if not self.count:
+            return "none"
+        return (f"{self.count} x, mean {self.mean_ms():.2f} ms, p95 {self.percentile_ms(0.95):.2f} ms, "
+                f"max {self.max_ms:.2f} ms")
+
+    def to_dict(self):
+        labels = [f"<={bound}" for bound in PERF_HISTOGRAM_BUCKETS_MS] + [f">{PERF_HISTOGRAM_BUCKETS_MS[-1]}"]
+        return {
+            'count': self.count,
+            'total_ms': round(self.total_ms, 3),
+            'mean_ms': round(self.mean_ms(), 3),
+            'p50_ms': round(self.percentile_ms(0.5), 3),
+            'p95_ms': round(self.percentile_ms(0.95), 3),
+            'max_ms': round(self.max_ms, 3),
+            'buckets_ms': dict(zip(labels, self.buckets)),
+        }
+
+
+class PerfStats:
+    """Hot-path timings, collected only while enabled so that otherwise they cost one attribute check
+
+    App-wide timings are kept here by name; paint and animation frame timings live on
+    each OverlayWindow and are gathered by snapshot().
+    """
+
+    def __init__(self):
+        self.enabled = False
+        # Decodes are timed on worker threads as well
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self, overlays=()):
+        with self.lock:
+            self.timings = {}
+            self.decoded_bytes = 0
+        self.started = time.monotonic()
+        for overlay in overlays:
+            overlay.reset_perf_stats()
+
+    def set_enabled(self, enabled):
+        if enabled and not self.enabled:
+            self.started = time.monotonic()
+        self.enabled = enabled
+
+    def record(self, name, ms):
+        with self.lock:
+            histogram = self.timings.get(name)
+            if histogram is None:
+                histogram = self.timings[name] = TimingHistogram()
+            histogram.record(ms)
+
+    def record_decode(self, ms, size):
+        self.record('decode', ms)
+        with self.lock:
+            self.decoded_bytes += size
+
+    def snapshot(self, overlays):
+        """Everything recorded so far as plain data, ready for JSON"""
+        with self.lock:
+            timings = {name: histogram.to_dict() for name, histogram in self.timings.items()}
+            decoded_bytes = self.decoded_bytes
+        return {
+            'recording': self.enabled,
+            'seconds': round(time.monotonic() - self.started, 1),
+            'timings': timings,
+            'decoded_bytes': decoded_bytes,
+            'counters': self.counters(),
+            'overlays': [overlay.perf_snapshot() for overlay in overlays],
+        }
+
+    def counters(self):
+        """Running totals kept by the caches, counted whether or not recording is on"""
+        return {
+            'image_decodes': image_store.decode_count,
+            'memory_trims': memory_accountant.trims,
+            'disk_cache_hits': disk_frame_cache.hits,
+            'disk_cache_misses': disk_frame_cache.misses,
+        }
+
+    def report(self, overlays):
+        """Human readable summary for the Performance panel"""
+        state = "Recording" if self.enabled else "Not recording"
+        lines = [f"{state}, {time.monotonic() - self.started:.0f} s of data", ""]
+        with self.lock:
+            for name, histogram in sorted(self.timings.items()):
+                lines.append(f"{name}: {histogram.summary()}")
+            lines.append(f"decoded: {format_bytes(self.decoded_bytes)}")
+        lines.append(", ".join(f"{name.replace('_', ' ')}: {count}" for name, count in self.counters().items()))
+        for i, overlay in enumerate(overlays):
+            lines.append("")
+            lines.append(f"{i + 1}. {os.path.basename(overlay.file)} ({format_bytes(overlay.bytes_held())} held)")
+            lines.append(f"   paints: {overlay.paint_timings.summary()}")
+            if overlay.isAnimated:
+                lines.append(f"   frames: {overlay.frames_shown} shown, {overlay.frames_dropped} dropped, "
+                             f"steps {overlay.frame_timings.summary()}")
+        return "\n".join(lines)
+
+
+perf_stats = PerfStats()
+
+overlay_ids = itertools.count(1)
+
 
 class OverlayWindow(QWidget):
-    def __init__(self, file, config=None, parent=None):
+    def __init__(self, file, config=None, parent=None, decoded=None, placeholder=None):
         super().__init__()
         self.file = file
+        self.overlay_id = next(overlay_ids)
         self.parent_controller = parent
-        self.isGif = file.lower().endswith(".gif")
+        self.last_interaction = time.monotonic()
+        # Detected from the content, so GIF, APNG and animated WebP whatever the extension
+        self.animation_format = sniff_animation(file)
+        self.isAnimated = self.animation_format is not None
         self.dragging = False
         self.aspect_ratio = None
         self.rotation = 0
         self.opacity_value = 1.0
         self.click_through = False
-
-        self.setWindowFlags(
-            Qt.FramelessWindowHint |
-            Qt.WindowStaysOnTopHint |
-            Qt.Tool
-        )
+        self.render_cache = None
+        self.render_cache_key = None
+        self.render_cache_smooth = False
+        self.render_cache_hits = 0
+        self.render_cache_misses = 0
+        self.paint_timings = TimingHistogram()
+        self.interactive = False
+        self.pending_pos = None
+        self.pending_resize = False
+        self.suspended = False
+        # Composite surface this overlay is drawn into, None while it is its own window
+        self.surface = None
+        self.screen_window = None
+
+        self.idle_timer = QTimer(self)
+        self.idle_timer.setSingleShot(True)
+        self.idle_timer.setInterval(INTERACTIVE_IDLE_MS)
+        self.idle_timer.timeout.connect(self.end_interaction)
+
+        self.geometry_timer = QTimer(self)
+        self.geometry_timer.setSingleShot(True)
+        self.geometry_timer.timeout.connect(self.apply_pending_geometry)
+
+        self.setWindowFlags(OVERLAY_WINDOW_FLAGS)
         self.setAttribute(Qt.WA_TranslucentBackground)
 
-        if self.isGif:
-            self.movie = QMovie(file)
-            self.movie.frameChanged.connect(self.update)
-            self.movie.start()
-            frame = self.movie.currentPixmap()
-            w, h = frame.width(), frame.height()
+        if self.isAnimated:
+            self.frames = None
+            self.frame_mapping = None
+            self.frame_cache_built = 0.0
+            self.frame_delays = []
+            self.frame_index = 0
+            self.frame_cache_size = None
+            self.frame_cache_state = 'streaming'
+            self.next_frame_due = None
+            self.frames_shown = 0
+            self.frames_dropped = 0
+            self.frame_timings = TimingHistogram()
+
+            # Area of the source frame that changed since the last repaint (per-frame
+            # rects come with the cached frames, or from the decoder thread when streaming)
+            self.frame_damage = QRect()
+            self.frame_changes = None
+            self.repainted_pixels = 0
+            self.frame_pixels = 0
+
+            # Frames that are not cached come from a FrameStream, stepped by the shared
+            # animation clock; the frame on screen is kept in stream_pixmap
+            self.stream = None
+            self.stream_pixmap = None
+            self.stream_delay = DEFAULT_FRAME_DELAY_MS
+            self.frame_ready = False
+            reader = open_animation(file)
+            self.frame_count = reader.frame_count
+            self.loop_count = reader.loop_count
+            self.loops_played = 0
+            self.source_size = reader.size
+            w, h = self.source_size.width(), self.source_size.height()
         else:
-            self.pix = QPixmap(file)
-            w, h = self.pix.width(), self.pix.height()
+            self.image_key = image_store.acquire(file, decoded.get('image') if decoded else None)
+            self.source_size = image_store.source_size(self.image_key)
+            w, h = self.source_size.width(), self.source_size.height()
 
         self.aspect_ratio = w / h
 
-        max_side = 350
+        max_side = MAX_INITIAL_SIDE
         if w > max_side or h > max_side:
             scale = max_side / max(w, h)
             w = int(w * scale)
@@ -50,8 +1372,7 @@ class OverlayWindow(QWidget):
         self.original_height = h
 
         if config:
-            self.original_width = config.get('width', w)
-            self.original_height = config.get('height', h)
+            self.original_width, self.original_height = self.size_from_config(config, w, h)
             self.rotation = config.get('rotation', 0)
             self.opacity_value = config.get('opacity', 1.0)
             self.click_through = config.get('click_through', False)
@@ -59,40 +1380,560 @@ class OverlayWindow(QWidget):
             if pos:
                 self.move(pos[0], pos[1])
 
+        # A placeholder (the thumbnail embedded in the layout) is shown at the right
+        # geometry until finish_decode() delivers the real image
+        self.placeholder = None
+        self.placeholder_pyramid = None
+        self.thumbnail_data = None
+        if placeholder is not None and not self.isAnimated and not image_store.has_decoded(
+                file, self.device_size().width(), self.device_size().height()):
+            self.placeholder = placeholder
+            self.placeholder_pyramid = MipmapPyramid(placeholder)
+        elif not self.isAnimated:
+            self.load_source(self.device_size().width(), self.device_size().height())
+
         self.update_window_size()
-        self.setWindowOpacity(self.opacity_value)
+        self.apply_window_opacity()
         self.update_click_through()
+        if parent is not None and parent.composite_mode:
+            self.set_composited(True)
+
+        if self.isAnimated:
+            if placeholder is None:
+                self.build_frame_cache(decoded)
+            else:
+                self.stream_pixmap = placeholder
+                self.frame_cache_state = 'loading'
+            animation_clock.register(self)
+
+    def awaiting_decode(self):
+        """True while the overlay still shows the layout thumbnail instead of its image"""
+        return self.placeholder is not None or (self.isAnimated and self.frame_cache_state == 'loading')
+
+    def finish_decode(self, decoded):
+        """Replace the placeholder with the image decoded by a worker thread"""
+        if self.isAnimated:
+            self.build_frame_cache(decoded)
+        else:
+            image_store.offer(self.image_key, decoded.get('image'))
+            self.placeholder = None
+            self.placeholder_pyramid = None
+            self.load_source(self.device_size().width(), self.device_size().height())
+        self.invalidate_render_cache()
+        self.update()
+        if self.parent_controller:
+            self.parent_controller.overlayModel.refresh_overlay(self)
 
     def paintEvent(self, event):
+        if self.suspended:
+            return
+        start = time.perf_counter() if perf_stats.enabled else None
         painter = QPainter(self)
-        painter.setRenderHint(QPainter.SmoothPixmapTransform)
-        
+        if self.surface is not None:
+            painter.setOpacity(self.opacity_value)
+        rect = event.rect()
+        frame = self.rendered_frame()
+        # The frame is rendered at device pixel size, so this is a 1:1 copy
+        ratio = frame.devicePixelRatio()
+        source = QRectF(rect.x() * ratio, rect.y() * ratio, rect.width() * ratio, rect.height() * ratio)
+        painter.drawPixmap(QRectF(rect), frame, source)
+        if start is not None:
+            painter.end()
+            self.paint_timings.record(elapsed_ms(start))
+
+    def rendered_frame(self):
+        """Return the scaled and rotated frame, rendering it only on a cache miss
+
+        The frame is rendered at the device pixel size of the overlay's screen, so the
+        source is resampled once and painting never has to scale it again.
+        """
+        frame_number = self.current_frame_number()
+        ratio = self.devicePixelRatioF()
+        key = (self.original_width, self.original_height, self.rotation, frame_number, ratio)
+        # A full quality frame is always good enough, a fast one only while interacting
+        usable = self.interactive or self.render_cache_smooth
+        if self.render_cache is not None and self.render_cache_key == key and usable:
+            self.render_cache_hits += 1
+            return self.render_cache
+        self.render_cache_misses += 1
+
+        target = self.device_size()
+        if self.isAnimated:
+            pix = self.current_pixmap()
+        else:
+            too_small = target.width() > self.pix.width() or target.height() > self.pix.height()
+            if too_small and not self.interactive and self.placeholder is None:
+                self.load_source(int(target.width() * DECODE_HEADROOM), int(target.height() * DECODE_HEADROOM))
+            pix = self.pyramid.level_for(target.width(), target.height())
+
+        transform_mode = Qt.FastTransformation if self.interactive else Qt.SmoothTransformation
+        scaled_pix = pix.scaled(target, Qt.KeepAspectRatio, transform_mode)
+        scaled_pix.setDevicePixelRatio(ratio)
+
+        canvas = QPixmap(self.size() * ratio)
+        canvas.setDevicePixelRatio(ratio)
+        canvas.fill(Qt.transparent)
+        painter = QPainter(canvas)
+        painter.setRenderHint(QPainter.SmoothPixmapTransform, not self.interactive)
         painter.translate(self.width() / 2, self.height() / 2)
         painter.rotate(self.rotation)
         painter.translate(-self.original_width / 2, -self.original_height / 2)
+        painter.drawPixmap(0, 0, scaled_pix)
+        painter.end()
+
+        self.render_cache = canvas
+        self.render_cache_key = key
+        self.render_cache_smooth = not self.interactive
+        return canvas
+
+    def device_size(self):
+        """Overlay size in device pixels of the screen it is on"""
+        # QSize rounds like Qt does for the window's backing store
+        return QSize(self.original_width, self.original_height) * self.devicePixelRatioF()
+
+    def on_screen_changed(self, screen):
+        """The window moved to another screen: render again only if its pixel density differs"""
+        changed = False
+        if self.render_cache_key is not None and self.render_cache_key[-1] != self.devicePixelRatioF():
+            self.invalidate_render_cache()
+            changed = True
+        if self.isAnimated and not self.interactive and self.frame_cache_size != self.device_size():
+            self.build_frame_cache()
+            changed = True
+        if changed:
+            self.update()
+
+    @property
+    def pyramid(self):
+        """Mipmap pyramid of the still image, read through the shared store on every use
+
+        Overlays never keep their own reference, so when one of them gets a sharper or a
+        trimmed decode the others use it too and only one copy is held.
+        """
+        if self.placeholder is not None:
+            return self.placeholder_pyramid
+        entry = image_store.entries.get(self.image_key)
+        return entry.pyramid if entry is not None else None
+
+    @property
+    def pix(self):
+        pyramid = self.pyramid
+        return pyramid.levels[0] if pyramid is not None else None
+
+    def load_source(self, width, height):
+        """Get the image from the shared store at (or near) the given size instead of full resolution"""
+        image_store.pyramid(self.image_key, width, height)
+
+    def trim_source(self, size):
+        """Drop pixels beyond size from the shared source, it is decoded again if the overlay grows
+
+        Returns True if anything was dropped.
+        """
+        if self.placeholder is not None:
+            return False
+        before = self.pyramid
+        return image_store.shrink(self.image_key, size.width(), size.height()) is not before
+
+    def bytes_held(self):
+        """Bytes of decoded pixels currently held by this overlay"""
+        if self.isAnimated and self.frames is not None and self.frame_mapping is None:
+            held = sum(pixmap_bytes(frame) for frame in self.frames)
+        elif self.isAnimated:
+            held = self.stream_bytes()
+        else:
+            held = self.pyramid.bytes_held()
+        return held + pixmap_bytes(self.render_cache)
+
+    def full_resolution_bytes(self):
+        """Bytes a full resolution decode of the source would hold"""
+        return self.source_size.width() * self.source_size.height() * 4
+
+    def stream_bytes(self):
+        """Bytes of the streamed frame on screen and the frames decoded ahead of it"""
+        held = pixmap_bytes(self.stream_pixmap)
+        if self.stream is not None:
+            held += self.stream.bytes_held()
+        return held
+
+    def invalidate_render_cache(self):
+        """Drop the cached frame so the next paint renders it again"""
+        self.render_cache = None
+        self.render_cache_key = None
+
+    def on_frame_changed(self, frame_number):
+        """A new animation frame is ready, repaint only the part of the window it changed"""
+        self.invalidate_render_cache()
+        damage = self.frame_damage
+        self.frame_damage = QRect()
+        if damage.isEmpty():
+            return
+        rect = self.frame_transform().mapRect(QRectF(damage)).toAlignedRect()
+        # Smooth scaling and rotation blend each source pixel into its neighbours
+        pad = int(max(self.original_width / max(self.frame_size().width(), 1),
+                      self.original_height / max(self.frame_size().height(), 1))) + 2
+        rect = rect.adjusted(-pad, -pad, pad, pad).intersected(self.rect())
+        self.repainted_pixels += rect.width() * rect.height()
+        self.frame_pixels += self.width() * self.height()
+        self.update(rect)
+
+    def frame_size(self):
+        """Size of the source frames the animation is stepping through, or of the still image"""
+        if not self.isAnimated:
+            return self.source_size
+        if self.frames is not None:
+            return self.frames[0].size()
+        if self.stream_pixmap is not None:
+            return self.stream_pixmap.size()
+        return self.source_size
+
+    def frame_transform(self):
+        """Maps source frame coordinates to window coordinates, the same way rendered_frame() draws"""
+        source = self.frame_size()
+        scaled = source.scaled(self.original_width, self.original_height, Qt.KeepAspectRatio)
+        transform = QTransform()
+        transform.translate(self.width() / 2, self.height() / 2)
+        transform.rotate(self.rotation)
+        transform.translate(-self.original_width / 2, -self.original_height / 2)
+        transform.scale(scaled.width() / max(source.width(), 1), scaled.height() / max(source.height(), 1))
+        return transform
+
+    def mark_frame_changed(self, change):
+        """Add the area changed by stepping to the current frame to the pending damage"""
+        self.frame_damage = self.frame_damage.united(change)
+
+    def mark_frame_jumped(self):
+        """The animation skipped frames, so the whole frame has to be repainted"""
+        self.frame_damage = QRect(QPoint(0, 0), self.frame_size())
+
+    def repaint_fraction(self):
+        """Average share of the window repainted per animation frame"""
+        return self.repainted_pixels / self.frame_pixels if self.frame_pixels else 1.0
+
+    def current_frame_number(self):
+        if not self.isAnimated:
+            return 0
+        return self.frame_index
+
+    def current_pixmap(self):
+        """Current source frame: the cached frame, the streamed frame or the static image"""
+        if not self.isAnimated:
+            return self.pix
+        if self.frame_mapping is not None:
+            return QPixmap.fromImage(self.frames[self.frame_index])
+        if self.frames is not None:
+            return self.frames[self.frame_index]
+        return self.stream_pixmap
+
+    def build_frame_cache(self, decoded=None):
+        """Decode and scale every frame once at the current size if it fits the budget, stream otherwise
+
+        decoded may hold frames already decoded by a worker thread at the right size.
+        """
+        self.frame_cache_size = self.device_size()
+        self.discard_frames()
+        if not gif_frame_cache.enabled:
+            self.frame_cache_state = 'disabled'
+            self.start_stream()
+            return
 
-        if self.isGif:
-            frame = self.movie.currentPixmap()
-            pix = frame
+        plan = plan_frame_cache(self.file, self.frame_cache_size.width(), self.frame_cache_size.height())
+        if plan is None:
+            self.frame_cache_state = 'streaming'
+            self.start_stream()
+            return
+
+        size, count, needed = plan
+        changes = None
+        if decoded and decoded.get('frame_size') == size:
+            images, delays, mapping = decoded['frames'], decoded['delays'], decoded.get('mapping')
+            changes = decoded.get('changes')
+        elif disk_frame_cache.enabled:
+            images, delays, mapping = load_animation_frames(self.file, size, count)
         else:
-            pix = self.pix
+            images, delays, mapping = None, None, None
 
-        scaled_pix = pix.scaled(self.original_width, self.original_height, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-        painter.drawPixmap(0, 0, scaled_pix)
+        # Mapped frames are paged in by the OS and don't count against the in-memory budget
+        if mapping is None and not gif_frame_cache.reserve(self, needed):
+            self.frame_cache_state = 'streaming'
+            self.start_stream()
+            return
+        if images is None:
+            images, delays = read_animation_frames(self.file, size, count)
+        frames = images if mapping is not None else [QPixmap.fromImage(image) for image in images]
+        if not frames:
+            gif_frame_cache.release(self)
+            self.frame_cache_state = 'streaming'
+            self.start_stream()
+            return
+
+        self.stop_stream()
+        self.frame_changes = changes if changes is not None else frame_change_rects(images)
+        self.frames = frames
+        self.frame_mapping = mapping
+        self.frame_delays = delays
+        self.frame_index = min(max(self.frame_index, 0), len(frames) - 1)
+        self.frame_ready = True
+        self.stream_pixmap = None
+        self.frame_cache_state = 'mapped' if mapping is not None else 'cached'
+        self.frame_cache_built = time.monotonic()
+        self.invalidate_render_cache()
+        self.update()
+
+    def start_stream(self):
+        """Play from a background decoder at the current display size, continuing after the frame on screen"""
+        size = self.device_size()
+        if self.stream is not None:
+            self.stream.set_size(size)
+            return
+        start = (self.frame_index + 1) % max(self.frame_count, 1) if self.frame_ready else 0
+        self.stream = FrameStream(self.file, size, start, self.loops_played)
+        if self.stream_pixmap is None:
+            # Nothing to show yet: wait for the first frame once, every later one is decoded ahead
+            self.step_frame()
+        if self.stream_pixmap is None:
+            self.stream_pixmap = QPixmap(size)
+            self.stream_pixmap.fill(Qt.transparent)
+
+    def stop_stream(self):
+        if self.stream is not None:
+            self.stream.stop()
+            self.stream = None
+
+    def current_frame_delay(self):
+        if self.frames is not None:
+            return self.frame_delays[self.frame_index]
+        return self.stream_delay
+
+    def step_frame(self):
+        """Move to the next frame, returns False once the animation has played all its loops
+
+        A streaming animation waits for its decoder if the next frame is not ready yet.
+        """
+        if self.frames is None:
+            return self.take_stream_frame()
+        frame_count = len(self.frames)
+        next_index = self.frame_index + 1
+        if next_index >= frame_count:
+            next_index = 0
+        if next_index == 0:
+            self.loops_played += 1
+            if 0 <= self.loop_count < self.loops_played:
+                return False
+        self.frame_index = next_index
+        self.mark_frame_changed(self.frame_changes[self.frame_index])
+        return True
+
+    def take_stream_frame(self):
+        frame = self.stream.take(wait=True) if self.stream is not None else None
+        if frame is None:
+            return False
+        if self.stream_pixmap is None or frame.image.size() != self.stream_pixmap.size():
+            # First frame, or the first one decoded at a new size
+            self.mark_frame_changed(frame.image.rect())
+        else:
+            self.mark_frame_changed(frame.change)
+        self.stream_pixmap = QPixmap.fromImage(frame.image)
+        self.stream_delay = frame.delay
+        self.frame_index = frame.number
+        self.frame_ready = True
+        return True
+
+    def advance_animation(self, now):
+        """Called by the animation clock, returns True if the displayed frame changed"""
+        if self.next_frame_due is None:
+            self.next_frame_due = now + self.current_frame_delay()
+            return False
+        if now < self.next_frame_due:
+            return False
+
+        # Jump to the frame due now: cached frames are random access, a stream can
+        # skip through the frames its decoder already has buffered
+        limit = len(self.frames) if self.frames is not None else STREAM_BUFFER_FRAMES
+        steps = 0
+        ended = False
+        while now >= self.next_frame_due and steps < limit:
+            if self.frames is None and (self.stream is None or not self.stream.ready()):
+                # The decoder is behind: keep this frame up and look again on the next tick
+                break
+            if not self.step_frame():
+                ended = True
+                break
+            steps += 1
+            self.next_frame_due += self.current_frame_delay()
+        if steps == 0:
+            if ended:
+                animation_clock.unregister(self)
+            return False
+        self.frames_dropped += steps - 1
+        if now >= self.next_frame_due:
+            self.next_frame_due = now + self.current_frame_delay()
+
+        self.frames_shown += 1
+        gif_frame_cache.touch(self)
+        return True
+
+    def set_suspended(self, suspended):
+        """Pause animation and painting while the overlay cannot be seen"""
+        if suspended == self.suspended:
+            return
+        self.suspended = suspended
+        if self.isAnimated:
+            if suspended:
+                animation_clock.unregister(self)
+            else:
+                self.catch_up_animation(animation_clock.now())
+                animation_clock.register(self)
+        if not suspended:
+            self.update()
+
+    def catch_up_animation(self, now):
+        """Jump to the frame that would be showing now had the animation kept playing"""
+        if self.next_frame_due is None or now < self.next_frame_due:
+            return
+        behind = now - self.next_frame_due
+        if self.frames is not None:
+            behind %= sum(self.frame_delays)
+            index = (self.frame_index + 1) % len(self.frames)
+            while behind >= self.frame_delays[index]:
+                behind -= self.frame_delays[index]
+                index = (index + 1) % len(self.frames)
+            self.frame_index = index
+            self.next_frame_due = now + self.current_frame_delay() - behind
+        else:
+            # The decoder goes frame by frame: have it skip to the frame due now and
+            # show that one as soon as it is ready
+            skip = behind // self.current_frame_delay() % max(self.frame_count, 1)
+            if self.stream is not None and skip:
+                self.stream.skip(skip)
+            self.next_frame_due = now
+        self.mark_frame_jumped()
+        self.invalidate_render_cache()
+
+    def opaque_rect(self):
+        """Window area the overlay completely hides, empty if anything behind it shows through"""
+        if self.isAnimated or self.opacity_value < 1.0 or self.rotation % 90 or self.pix.hasAlphaChannel():
+            return QRect()
+        # The image keeps its aspect ratio, so it need not fill the whole window
+        source = self.frame_size()
+        return self.frame_transform().mapRect(QRectF(0, 0, source.width(), source.height())).toRect()
+
+    def notify_controller(self):
+        if self.surface is not None:
+            self.surface.schedule_mask_update()
+        if self.parent_controller:
+            self.parent_controller.schedule_visibility_update()
+            self.parent_controller.schedule_autosave()
+
+    def moveEvent(self, event):
+        super().moveEvent(event)
+        self.notify_controller()
+
+    def resizeEvent(self, event):
+        super().resizeEvent(event)
+        self.notify_controller()
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        # A new native window is created whenever the overlay leaves a composite surface
+        handle = self.windowHandle()
+        if handle is not None and handle is not self.screen_window:
+            self.screen_window = handle
+            handle.screenChanged.connect(self.on_screen_changed)
+        if self.parent_controller and self.isWindow():
+            self.parent_controller.note_raised(self)
+        self.notify_controller()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.notify_controller()
+
+    def changeEvent(self, event):
+        super().changeEvent(event)
+        if event.type() == QEvent.WindowStateChange:
+            self.notify_controller()
+
+    def discard_frames(self):
+        """Give back the pre-decoded frames, keeping the one on screen"""
+        gif_frame_cache.release(self)
+        if self.frames is None:
+            return
+        self.stream_pixmap = self.current_pixmap()
+        self.stream_delay = self.frame_delays[self.frame_index]
+        self.frames = None
+        self.frame_changes = None
+        self.frame_mapping = None
+        self.frame_delays = []
+
+    def release_frame_cache(self):
+        """Give back the pre-decoded frames and continue with streaming decode"""
+        if self.frames is None:
+            gif_frame_cache.release(self)
+            return
+        self.discard_frames()
+        self.start_stream()
+        self.invalidate_render_cache()
+        self.update()
+
+    def drop_frame_cache(self):
+        """Called by the frame cache when this overlay is evicted"""
+        self.release_frame_cache()
+        self.frame_cache_state = 'evicted'
+
+    def frame_cache_description(self):
+        if self.frame_cache_state == 'cached':
+            total = sum(pixmap_bytes(frame) for frame in self.frames)
+            return f"cached ({len(self.frames)} frames, {format_bytes(total)})"
+        if self.frame_cache_state == 'mapped':
+            return f"mapped from disk cache ({len(self.frames)} frames)"
+        return self.frame_cache_state
+
+    def render_cache_stats(self):
+        """Return render cache hit/miss counters"""
+        return {'hits': self.render_cache_hits, 'misses': self.render_cache_misses}
+
+    def reset_perf_stats(self):
+        self.paint_timings.reset()
+        if self.isAnimated:
+            self.frame_timings.reset()
+            self.frames_shown = 0
+            self.frames_dropped = 0
+
+    def perf_snapshot(self):
+        """Paint and animation statistics of this overlay for the performance dump"""
+        snapshot = {
+            'id': self.overlay_id,
+            'file': self.file,
+            'bytes_held': self.bytes_held(),
+            'render_cache': self.render_cache_stats(),
+            'paints': self.paint_timings.to_dict(),
+        }
+        if self.isAnimated:
+            snapshot['frames_shown'] = self.frames_shown
+            snapshot['frames_dropped'] = self.frames_dropped
+            snapshot['frame_steps'] = self.frame_timings.to_dict()
+            snapshot['frame_cache'] = self.frame_cache_state
+            snapshot['repaint_fraction'] = round(self.repaint_fraction(), 4)
+        return snapshot
 
     def mousePressEvent(self, event):
         if event.button() == Qt.LeftButton and not self.click_through:
             self.dragging = True
-            self.drag_pos = event.globalPos() - self.frameGeometry().topLeft()
+            self.last_interaction = time.monotonic()
+            self.drag_pos = event.globalPos() - self.global_pos()
+            if self.parent_controller and self.surface is None:
+                # Clicking a window brings it to the front
+                self.parent_controller.note_raised(self)
             event.accept()
 
     def mouseMoveEvent(self, event):
         if self.dragging and not self.click_through:
-            self.move(event.globalPos() - self.drag_pos)
+            self.pending_pos = event.globalPos() - self.drag_pos
+            self.begin_interaction()
             event.accept()
 
     def mouseReleaseEvent(self, event):
         self.dragging = False
+        self.apply_pending_geometry()
         if self.parent_controller:
             self.parent_controller.restore_z_order()
         event.accept()
@@ -107,16 +1948,60 @@ class OverlayWindow(QWidget):
             scale_factor = 1 + (delta / 1000)
             self.original_width = max(50, int(self.original_width * scale_factor))
             self.original_height = int(self.original_width / self.aspect_ratio)
-            self.update_window_size()
+            self.invalidate_render_cache()
+            self.pending_resize = True
+            self.begin_interaction()
 
         elif QApplication.mouseButtons() & Qt.RightButton:
             self.rotation += delta / 10
             self.rotation %= 360
+            self.invalidate_render_cache()
+            self.pending_resize = True
+            self.begin_interaction()
+
+    def begin_interaction(self):
+        """Render with fast transforms and merge geometry changes until input goes idle"""
+        self.interactive = True
+        self.last_interaction = time.monotonic()
+        self.idle_timer.start()
+        if not self.geometry_timer.isActive():
+            self.geometry_timer.start(self.frame_interval_ms())
+
+    def end_interaction(self):
+        """Input went idle: apply the final geometry and re-render at full quality"""
+        self.apply_pending_geometry()
+        self.interactive = False
+        if self.surface is not None and self.surface is not self.parent_controller.surface_for(self):
+            # Dragged onto another screen
+            self.set_composited(True)
+            self.parent_controller.restore_z_order()
+        self.notify_controller()
+        if self.isAnimated and self.frame_cache_size != self.device_size():
+            self.build_frame_cache()
+        if not self.render_cache_smooth:
+            self.invalidate_render_cache()
+            self.update()
+
+    def apply_pending_geometry(self):
+        """Apply the merged move/resize at most once per display frame"""
+        self.geometry_timer.stop()
+        if self.pending_resize:
+            self.pending_resize = False
             self.update_window_size()
-    
+        if self.pending_pos is not None:
+            self.move_global(self.pending_pos)
+            self.pending_pos = None
+
+    def frame_interval_ms(self):
+        """Refresh interval of the screen the overlay is on"""
+        screen = self.screen() if self.isVisible() else QApplication.primaryScreen()
+        rate = screen.refreshRate() if screen else 0
+        return max(1, int(1000 / rate)) if rate > 0 else 16
+
     def update_window_size(self):
         """Resize window to fit rotated image"""
         import math
+        start = time.perf_counter() if perf_stats.enabled else None
         
         angle_rad = math.radians(self.rotation)
         cos_a = abs(math.cos(angle_rad))
@@ -126,17 +2011,80 @@ class OverlayWindow(QWidget):
         new_height = int(self.original_width * sin_a + self.original_height * cos_a)
         
         self.setFixedSize(new_width, new_height)
+        self.invalidate_render_cache()
         self.update()
+        if start is not None:
+            perf_stats.record('update_window_size', elapsed_ms(start))
+
+    def global_pos(self):
+        """Top-left corner in screen coordinates, also while drawn inside a composite surface"""
+        if self.surface is not None:
+            return self.surface.pos() + self.pos()
+        return self.pos()
+
+    def global_geometry(self):
+        return QRect(self.global_pos(), self.size())
+
+    def move_global(self, pos):
+        if self.surface is not None:
+            pos = pos - self.surface.pos()
+        self.move(pos)
+
+    def set_composited(self, enabled):
+        """Move the overlay into the controller's composite surface for its screen, or back into its own window"""
+        pos = self.global_pos()
+        visible = self.isVisible()
+        if self.surface is not None:
+            self.surface.remove_item(self)
+            self.surface = None
+        if enabled:
+            self.parent_controller.surface_for(self, pos).add_item(self, pos)
+        elif self.parentWidget() is not None:
+            self.setParent(None)
+            self.setWindowFlags(OVERLAY_WINDOW_FLAGS)
+            self.move(pos)
+        self.apply_window_opacity()
+        if visible:
+            self.show()
+        # New windows and newly added children start out on top
+        self.parent_controller.note_raised(self)
+
+    def apply_window_opacity(self):
+        if self.surface is None:
+            self.setWindowOpacity(self.opacity_value)
+        else:
+            self.update()
+
+    def apply_properties(self, properties):
+        """Apply merged property changes at once, returns False if none of them changed anything"""
+        changed = False
+        opacity = properties.get('opacity')
+        if opacity is not None and opacity != self.opacity_value:
+            self.opacity_value = opacity
+            self.apply_window_opacity()
+            changed = True
+        click_through = properties.get('click_through')
+        if click_through is not None and click_through != self.click_through:
+            self.set_click_through(click_through)
+            changed = True
+        if changed:
+            self.notify_controller()
+        return changed
 
     def set_opacity(self, value):
         """Set opacity (0-100)"""
         self.opacity_value = value / 100
-        self.setWindowOpacity(self.opacity_value)
+        self.apply_window_opacity()
+        self.notify_controller()
 
     def set_click_through(self, enabled):
         """Enable/disable click-through mode"""
+        changed = enabled != self.click_through
         self.click_through = enabled
         self.update_click_through()
+        if changed and self.surface is not None:
+            # Click-through overlays live on the surface that ignores input
+            self.set_composited(True)
 
     def update_click_through(self):
         """Update window flags for click-through"""
@@ -145,9 +2093,60 @@ class OverlayWindow(QWidget):
         else:
             self.setAttribute(Qt.WA_TransparentForMouseEvents, False)
 
+    def closeEvent(self, event):
+        if self.surface is not None:
+            self.surface.remove_item(self)
+            self.surface = None
+            # Hand the widget back to Python so it is freed with its last reference
+            self.setParent(None)
+        if self.isAnimated:
+            animation_clock.unregister(self)
+            self.discard_frames()
+            self.stop_stream()
+        elif self.image_key is not None:
+            image_store.release(self.image_key)
+            self.image_key = None
+        super().closeEvent(event)
+
+    def apply_config(self, config):
+        """Update a live overlay in place from a saved layout entry"""
+        width, height = self.size_from_config(config, self.original_width, self.original_height)
+        resized = (width, height) != (self.original_width, self.original_height)
+        self.original_width = width
+        self.original_height = height
+        self.rotation = config.get('rotation', 0)
+        self.opacity_value = config.get('opacity', 1.0)
+        self.apply_window_opacity()
+        self.set_click_through(config.get('click_through', False))
+        pos = config.get('position')
+        if pos:
+            self.move_global(QPoint(pos[0], pos[1]))
+        self.update_window_size()
+        if resized and self.isAnimated:
+            self.build_frame_cache()
+        self.notify_controller()
+
+    def size_from_config(self, config, width, height):
+        """Width and height from config, a side it leaves out follows the image's aspect ratio"""
+        if 'width' in config and 'height' not in config:
+            return config['width'], int(config['width'] / self.aspect_ratio)
+        if 'height' in config and 'width' not in config:
+            return int(config['height'] * self.aspect_ratio), config['height']
+        return config.get('width', width), config.get('height', height)
+
+    def thumbnail_pixmap(self):
+        """Small preview of the overlay for the list and the layout file"""
+        if self.placeholder is not None:
+            return self.placeholder
+        if self.isAnimated:
+            return self.current_pixmap().scaled(THUMBNAIL_SIZE, THUMBNAIL_SIZE, Qt.KeepAspectRatio, Qt.SmoothTransformation)
+        return image_store.scaled(self.image_key, THUMBNAIL_SIZE, THUMBNAIL_SIZE)
+
     def get_config(self):
         """Return current configuration for saving"""
-        pos = self.pos()
+        pos = self.global_pos()
+        if self.thumbnail_data is None:
+            self.thumbnail_data = encode_thumbnail(self.thumbnail_pixmap())
         return {
             'file': self.file,
             'width': self.original_width,
@@ -155,21 +2154,461 @@ class OverlayWindow(QWidget):
             'rotation': self.rotation,
             'opacity': self.opacity_value,
             'click_through': self.click_through,
-            'position': [pos.x(), pos.y()]
+            'position': [pos.x(), pos.y()],
+            'thumbnail': self.thumbnail_data
         }
 
+class CompositeSurface(QWidget):
+    """One transparent full-screen window that draws many overlays as child widgets
+
+    Overlays stacked inside the surface are just paint order, so restacking costs no
+    window manager work, and an overlay update() only repaints its own rectangle. The
+    window is masked to the union of its overlays so the rest of the screen stays
+    usable. Click-through overlays go on a separate surface that ignores input, because
+    a window mask clips painting as well as input.
+    """
+
+    def __init__(self, screen, click_through):
+        super().__init__()
+        self.screen_ref = screen
+        self.click_through = click_through
+        self.items = []
+        flags = OVERLAY_WINDOW_FLAGS
+        if click_through:
+            flags |= Qt.WindowTransparentForInput
+        self.setWindowFlags(flags)
+        self.setAttribute(Qt.WA_TranslucentBackground)
+        self.setGeometry(screen.geometry())
+        screen.geometryChanged.connect(self.setGeometry)
+
+        self.mask_timer = QTimer(self)
+        self.mask_timer.setSingleShot(True)
+        self.mask_timer.setInterval(0)
+        self.mask_timer.timeout.connect(self.update_mask)
+
+    def add_item(self, overlay, global_pos):
+        overlay.setParent(self)
+        overlay.surface = self
+        overlay.move(global_pos - self.pos())
+        self.items.append(overlay)
+        self.schedule_mask_update()
+
+    def remove_item(self, overlay):
+        if overlay in self.items:
+            self.items.remove(overlay)
+        self.schedule_mask_update()
+
+    def schedule_mask_update(self):
+        self.mask_timer.start()
+
+    def update_mask(self):
+        """Limit the window to the overlays it draws, hide it when there are none"""
+        region = QRegion()
+        for overlay in self.items:
+            if overlay.isVisibleTo(self):
+                region += QRegion(overlay.geometry())
+        if region.isEmpty():
+            self.hide()
+            return
+        self.setMask(region)
+        if not self.isVisible():
+            self.show()
+
+
+class OverlayListModel(QAbstractListModel):
+    """List model over the controller's overlays with row-level updates and cached thumbnails"""
+
+    MIME_TYPE = 'application/x-desktopoverlay-ids'
+
+    def __init__(self, overlays, parent=None):
+        super().__init__(parent)
+        self.overlays = overlays
+        self.thumbnails = {}
+        self.stale_thumbnails = set()
+
+        self.thumbnail_timer = QTimer(self)
+        self.thumbnail_timer.setInterval(ANIMATED_THUMBNAIL_REFRESH_MS)
+        self.thumbnail_timer.timeout.connect(self.expire_animated_thumbnails)
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.overlays)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self.overlays):
+            return None
+        # The view fetches rows as it paints them, so this is where the list spends its time
+        start = time.perf_counter() if perf_stats.enabled else None
+        value = self.row_data(index.row(), role)
+        if start is not None:
+            perf_stats.record('list_data', elapsed_ms(start))
+        return value
+
+    def row_data(self, row, role):
+        overlay = self.overlays[row]
+        if role == Qt.DisplayRole:
+            return f"{row + 1}. {os.path.basename(overlay.file)}"
+        if role == Qt.DecorationRole:
+            return self.thumbnail(overlay)
+        if role == Qt.ToolTipRole:
+            stats = overlay.render_cache_stats()
+            tooltip = f"Render cache: {stats['hits']} hits / {stats['misses']} misses"
+            if overlay.isAnimated:
+                tooltip += f"\nFrames: {overlay.frame_cache_description()}"
+                tooltip += f"\nRepainted per frame: {overlay.repaint_fraction():.0%}"
+            return tooltip
+        if role == Qt.UserRole:
+            return overlay.overlay_id
+        return None
+
+    def thumbnail(self, overlay):
+        """List icon for overlay, only regenerated when missing or when an animated one went stale"""
+        icon = self.thumbnails.get(overlay.overlay_id)
+        if icon is not None and overlay.overlay_id not in self.stale_thumbnails:
+            return icon
+        start = time.perf_counter() if perf_stats.enabled else None
+        icon = self.thumbnails[overlay.overlay_id] = QIcon(overlay.thumbnail_pixmap())
+        self.stale_thumbnails.discard(overlay.overlay_id)
+        if start is not None:
+            perf_stats.record('list_thumbnail', elapsed_ms(start))
+        return icon
+
+    def expire_animated_thumbnails(self):
+        """Mark animated thumbnails stale, the view refetches the ones it actually shows"""
+        for row, overlay in enumerate(self.overlays):
+            if overlay.isAnimated:
+                self.stale_thumbnails.add(overlay.overlay_id)
+                index = self.index(row)
+                self.dataChanged.emit(index, index, [Qt.DecorationRole])
+
+    def refresh_overlay(self, overlay):
+        """Regenerate the thumbnail and tooltip of one row"""
+        row = self.row_of(overlay.overlay_id)
+        if row is None:
+            return
+        self.thumbnails.pop(overlay.overlay_id, None)
+        index = self.index(row)
+        self.dataChanged.emit(index, index, [Qt.DecorationRole, Qt.ToolTipRole])
+
+    def row_of(self, overlay_id):
+        for row, overlay in enumerate(self.overlays):
+            if overlay.overlay_id == overlay_id:
+                return row
+        return None
+
+    def renumber(self, first, last):
+        """Row labels carry the position, refresh them for rows that shifted"""
+        last = min(last, len(self.overlays) - 1)
+        if first <= last:
+            self.dataChanged.emit(self.index(first), self.index(last), [Qt.DisplayRole])
+
+    def add_overlay(self, overlay):
+        self.insert_overlay(len(self.overlays), overlay)
+
+    def insert_overlay(self, row, overlay):
+        self.beginInsertRows(QModelIndex(), row, row)
+        self.overlays.insert(row, overlay)
+        self.endInsertRows()
+        self.renumber(row + 1, len(self.overlays) - 1)
+        self.update_thumbnail_timer()
+
+    def remove_overlay(self, row):
+        self.beginRemoveRows(QModelIndex(), row, row)
+        overlay = self.overlays.pop(row)
+        self.thumbnails.pop(overlay.overlay_id, None)
+        self.stale_thumbnails.discard(overlay.overlay_id)
+        self.endRemoveRows()
+        self.renumber(row, len(self.overlays) - 1)
+        self.update_thumbnail_timer()
+        return overlay
+
+    def clear(self):
+        self.beginResetModel()
+        self.overlays.clear()
+        self.thumbnails.clear()
+        self.stale_thumbnails.clear()
+        self.endResetModel()
+        self.update_thumbnail_timer()
+
+    def move_overlay(self, source, destination):
+        """Move the row at source so it ends up before the row currently at destination"""
+        if destination in (source, source + 1):
+            return False
+        self.beginMoveRows(QModelIndex(), source, source, QModelIndex(), destination)
+        overlay = self.overlays.pop(source)
+        self.overlays.insert(destination - 1 if destination > source else destination, overlay)
+        self.endMoveRows()
+        self.renumber(min(source, destination), max(source, destination))
+        return True
+
+    def refresh(self):
+        """Refetch every row, dropping cached thumbnails"""
+        self.thumbnails.clear()
+        self.stale_thumbnails.clear()
+        if self.overlays:
+            self.dataChanged.emit(self.index(0), self.index(len(self.overlays) - 1))
+
+    def update_thumbnail_timer(self):
+        if any(overlay.isAnimated for overlay in self.overlays):
+            self.thumbnail_timer.start()
+        else:
+            self.thumbnail_timer.stop()
+
+    def flags(self, index):
+        if index.isValid():
+            return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+        return Qt.ItemIsDropEnabled
+
+    def supportedDropActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return [self.MIME_TYPE]
+
+    def mimeData(self, indexes):
+        data = QMimeData()
+        ids = [self.overlays[index.row()].overlay_id for index in indexes if index.isValid()]
+        data.setData(self.MIME_TYPE, json.dumps(ids).encode())
+        return data
+
+    def dropMimeData(self, data, action, row, column, parent):
+        if action != Qt.MoveAction or not data.hasFormat(self.MIME_TYPE):
+            return False
+        if row < 0:
+            row = parent.row() if parent.isValid() else len(self.overlays)
+        for overlay_id in json.loads(bytes(data.data(self.MIME_TYPE)).decode()):
+            source = self.row_of(overlay_id)
+            if source is None:
+                continue
+            self.move_overlay(source, row)
+            if source >= row:
+                row += 1
+        # The rows were moved in place, returning False keeps the view from removing the dragged rows
+        return False
+
+
+class PerformancePanel(QWidget):
+    """Live view of the recorded performance statistics, opened from the tray menu"""
+
+    def __init__(self, controller):
+        super().__init__()
+        self.controller = controller
+        self.setWindowTitle("Performance")
+        self.resize(520, 480)
+
+        self.recordCheck = QCheckBox("Record performance data")
+        self.recordCheck.setChecked(perf_stats.enabled)
+        self.recordCheck.stateChanged.connect(self.toggle_recording)
+
+        self.reportView = QPlainTextEdit()
+        self.reportView.setReadOnly(True)
+        self.reportView.setFont(QFontDatabase.systemFont(QFontDatabase.FixedFont))
+
+        self.btnReset = QPushButton("Reset")
+        self.btnReset.clicked.connect(self.reset)
+        self.btnExport = QPushButton("Save as JSON...")
+        self.btnExport.clicked.connect(self.export)
+
+        btnLayout = QHBoxLayout()
+        btnLayout.addWidget(self.btnReset)
+        btnLayout.addWidget(self.btnExport)
+
+        layout = QVBoxLayout()
+        layout.addWidget(self.recordCheck)
+        layout.addWidget(self.reportView)
+        layout.addLayout(btnLayout)
+        self.setLayout(layout)
+
+        self.refresh_timer = QTimer(self)
+        self.refresh_timer.setInterval(PERF_PANEL_REFRESH_MS)
+        self.refresh_timer.timeout.connect(self.refresh)
+
+    def showEvent(self, event):
+        super().showEvent(event)
+        self.recordCheck.setChecked(perf_stats.enabled)
+        self.refresh()
+        self.refresh_timer.start()
+
+    def hideEvent(self, event):
+        super().hideEvent(event)
+        self.refresh_timer.stop()
+
+    def refresh(self):
+        scroll = self.reportView.verticalScrollBar().value()
+        self.reportView.setPlainText(perf_stats.report(self.controller.overlays))
+        self.reportView.verticalScrollBar().setValue(scroll)
+
+    def toggle_recording(self, state):
+        perf_stats.set_enabled(state == Qt.Checked)
+        self.refresh()
+
+    def reset(self):
+        perf_stats.reset(self.controller.overlays)
+        self.refresh()
+
+    def export(self):
+        path, _ = QFileDialog.getSaveFileName(self, "Save Performance Data", "overlay_performance.json",
+                                              "JSON (*.json)")
+        if path:
+            self.controller.dump_performance(path)
+
+
+def app_data_dir():
+    """Per-user folder for settings, layouts and caches (%APPDATA% on Windows)"""
+    base = os.environ.get('APPDATA') or os.path.join(os.path.expanduser('~'), '.config')
+    return os.path.join(base, 'DesktopOverlay')
+
+
+class RegistryStartup:
+    """Starts the app at login through the Windows "Run" registry key"""
+
+    available = True
+    RUN_KEY = r"Software\Microsoft\Windows\CurrentVersion\Run"
+    OLD_NAMES = ["OverlayController", "DesktopOverlay by Ameno", "Desktop Overlay"]
+
+    def __init__(self, app_name):
+        self.app_name = app_name
+
+    def is_enabled(self):
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.RUN_KEY, 0, winreg.KEY_READ)
+        try:
+            value, _ = winreg.QueryValueEx(key, self.app_name)
+            current_exe = os.path.abspath(sys.argv[0])
+            return value.strip('"') == current_exe
+        except FileNotFoundError:
+            return False
+        finally:
+            winreg.CloseKey(key)
+
+    def cleanup(self):
+        """Remove old/duplicate startup entries"""
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.RUN_KEY, 0, winreg.KEY_ALL_ACCESS)
+        try:
+            current_exe = os.path.abspath(sys.argv[0])
+
+            for old_name in self.OLD_NAMES:
+                if old_name != self.app_name:
+                    try:
+                        winreg.DeleteValue(key, old_name)
+                        print(f"Removed old startup entry: {old_name}")
+                    except FileNotFoundError:
+                        pass
+
+            try:
+                value, _ = winreg.QueryValueEx(key, self.app_name)
+                if value.strip('"') != current_exe:
+                    winreg.DeleteValue(key, self.app_name)
+                    print(f"Removed outdated startup entry for {self.app_name}")
+            except FileNotFoundError:
+                pass
+        finally:
+            winreg.CloseKey(key)
+
+    def set_enabled(self, enabled):
+        key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, self.RUN_KEY, 0, winreg.KEY_WRITE)
+        try:
+            if enabled:
+                exe_path = os.path.abspath(sys.argv[0])
+                if ' ' in exe_path:
+                    exe_path = f'"{exe_path}"'
+                winreg.SetValueEx(key, self.app_name, 0, winreg.REG_SZ, exe_path)
+                print(f"Added to startup: {exe_path}")
+            else:
+                try:
+                    winreg.DeleteValue(key, self.app_name)
+                    print("Removed from startup")
+                except FileNotFoundError:
+                    pass
+        finally:
+            winreg.CloseKey(key)
+
+
+class NoStartup:
+    """Startup backend for platforms without the registry, and for tests and benchmarks"""
+
+    available = False
+
+    def is_enabled(self):
+        return False
+
+    def cleanup(self):
+        pass
+
+    def set_enabled(self, enabled):
+        pass
+
+
+def default_startup_backend(app_name):
+    return RegistryStartup(app_name) if winreg is not None else NoStartup()
+
+
 class MainWindow(QWidget):
-    def __init__(self):
+    def __init__(self, startup_backend=None):
         super().__init__()
         self.overlays = []
         self.file = None
+        self.preview_key = None
+
+        self.visibility_timer = QTimer(self)
+        self.visibility_timer.setSingleShot(True)
+        self.visibility_timer.setInterval(VISIBILITY_UPDATE_MS)
+        self.visibility_timer.timeout.connect(self.update_visibility)
+
+        # Decoding gets its own pool: Qt uses the global pool for multi-threaded image
+        # conversion, which would deadlock against Python tasks waiting for the GIL
+        self.decode_pool = QThreadPool(self)
+
+        self.layout_generation = 0
+        self.pending_layout = None
+
+        self.surfaces = {}
+
+        # Property changes merged per overlay and applied once per event loop pass
+        self.pending_properties = OrderedDict()
+        self.property_timer = QTimer(self)
+        self.property_timer.setSingleShot(True)
+        self.property_timer.setInterval(0)
+        self.property_timer.timeout.connect(self.apply_pending_properties)
+
+        # Overlays from bottom to top as they are believed to be stacked right now
+        self.window_stack = []
+        self.zorder_timer = QTimer(self)
+        self.zorder_timer.setSingleShot(True)
+        self.zorder_timer.setInterval(ZORDER_UPDATE_MS)
+        self.zorder_timer.timeout.connect(self.apply_z_order)
+
+        self.autosave_timer = QTimer(self)
+        self.autosave_timer.setSingleShot(True)
+        self.autosave_timer.setInterval(AUTOSAVE_IDLE_MS)
+        self.autosave_timer.timeout.connect(self.autosave)
+
+        # OVERLAY_PERF_TRACE=<file> records from startup and keeps that file up to date
+        self.perf_trace_file = os.environ.get(PERF_TRACE_ENV)
+        self.perf_dump_timer = QTimer(self)
+        self.perf_dump_timer.setInterval(PERF_DUMP_INTERVAL_MS)
+        self.perf_dump_timer.timeout.connect(self.dump_performance)
+        if self.perf_trace_file:
+            perf_stats.set_enabled(True)
+            self.perf_dump_timer.start()
+        self.performance_panel = PerformancePanel(self)
+        self.decode_signals = DecodeSignals(self)
+        self.decode_signals.finished.connect(self.on_overlay_decoded)
+
+        self.prewarm_generation = 0
+        self.prewarm_paths = []
+        self.prewarmed_keys = []
+        self.prewarm_signals = DecodeSignals(self)
+        self.prewarm_signals.finished.connect(self.on_prewarm_decoded)
         
-        app_data = os.path.join(os.environ['APPDATA'], 'DesktopOverlay')
+        app_data = app_data_dir()
         os.makedirs(app_data, exist_ok=True)
         
         self.config_file = os.path.join(app_data, 'overlay_config.json')
         self.settings_file = os.path.join(app_data, 'overlay_settings.json')
+        self.layouts_dir = os.path.join(app_data, 'layouts')
+        os.makedirs(self.layouts_dir, exist_ok=True)
+        disk_frame_cache.set_directory(os.path.join(app_data, 'frame_cache'))
         self.app_name = "DesktopOverlay"
+        self.startup = startup_backend or default_startup_backend(self.app_name)
 
         self.setWindowTitle("Overlay Controller")
         self.setFixedWidth(320)
@@ -207,15 +2646,32 @@ class MainWindow(QWidget):
         self.clickThroughCheck = QCheckBox("Click-through mode")
         self.clickThroughCheck.stateChanged.connect(self.toggle_click_through)
 
+        self.selectedOnlyCheck = QCheckBox("Apply to selected overlays only")
+        self.selectedOnlyCheck.stateChanged.connect(self.sync_property_controls)
+
         self.btnStart = QPushButton("Add New Overlay")
         self.btnStart.clicked.connect(self.start_overlay)
 
         listLabel = QLabel("Active Overlays:")
-        self.overlayList = QListWidget()
+        self.overlayModel = OverlayListModel(self.overlays, self)
+        self.overlayModel.rowsMoved.connect(self.on_list_reorder)
+        self.overlayModel.rowsInserted.connect(self.on_overlays_changed)
+        self.overlayModel.rowsRemoved.connect(self.on_overlays_changed)
+        self.overlayModel.rowsAboutToBeRemoved.connect(self.on_overlays_removing)
+        self.overlayModel.modelReset.connect(self.on_overlays_changed)
+
+        self.overlayList = QListView()
+        self.overlayList.setModel(self.overlayModel)
         self.overlayList.setMaximumHeight(200)
-        self.overlayList.setIconSize(QSize(60, 60))
-        self.overlayList.setDragDropMode(QListWidget.InternalMove)
-        self.overlayList.model().rowsMoved.connect(self.on_list_reorder)
+        self.overlayList.setIconSize(QSize(THUMBNAIL_SIZE, THUMBNAIL_SIZE))
+        self.overlayList.setUniformItemSizes(True)
+        self.overlayList.setDragDropMode(QListView.InternalMove)
+        self.overlayList.setDefaultDropAction(Qt.MoveAction)
+        self.overlayList.setSelectionMode(QListView.ExtendedSelection)
+        self.overlayList.selectionModel().selectionChanged.connect(self.sync_property_controls)
+
+        self.statusLabel = QLabel()
+        self.memoryLabel = QLabel()
 
         listBtnLayout = QHBoxLayout()
         self.btnRemove = QPushButton("Remove Selected")
@@ -225,11 +2681,20 @@ class MainWindow(QWidget):
         listBtnLayout.addWidget(self.btnRemove)
         listBtnLayout.addWidget(self.btnRemoveAll)
 
+        layoutNameLayout = QHBoxLayout()
+        layoutNameLabel = QLabel("Layout:")
+        self.layoutCombo = QComboBox()
+        self.layoutCombo.setEditable(True)
+        self.layoutCombo.addItems(self.layout_names())
+        self.layoutCombo.setCurrentText(self.current_layout)
+        layoutNameLayout.addWidget(layoutNameLabel)
+        layoutNameLayout.addWidget(self.layoutCombo, 1)
+
         saveBtnLayout = QHBoxLayout()
         self.btnSave = QPushButton("Save Layout")
         self.btnLoad = QPushButton("Load Layout")
-        self.btnSave.clicked.connect(self.save_layout)
-        self.btnLoad.clicked.connect(self.load_layout)
+        self.btnSave.clicked.connect(lambda: self.save_layout())
+        self.btnLoad.clicked.connect(lambda: self.load_layout())
         saveBtnLayout.addWidget(self.btnSave)
         saveBtnLayout.addWidget(self.btnLoad)
 
@@ -238,139 +2703,428 @@ class MainWindow(QWidget):
         self.autoLoadCheck.setChecked(self.auto_load_layout)
         self.autoLoadCheck.stateChanged.connect(self.toggle_auto_load)
         
+        self.autoSaveCheck = QCheckBox("Auto-save layout changes")
+        self.autoSaveCheck.setChecked(self.autosave_layout)
+        self.autoSaveCheck.stateChanged.connect(self.toggle_autosave)
+
+        self.prewarmCheck = QCheckBox("Pre-warm saved layouts")
+        self.prewarmCheck.setChecked(self.prewarm_layouts)
+        self.prewarmCheck.stateChanged.connect(self.toggle_prewarm)
+
+        self.gifCacheCheck = QCheckBox("Pre-decode short animations")
+        self.gifCacheCheck.setChecked(gif_frame_cache.enabled)
+        self.gifCacheCheck.stateChanged.connect(self.toggle_gif_cache)
+
+        self.diskCacheCheck = QCheckBox("Keep decoded animation frames on disk")
+        self.diskCacheCheck.setChecked(disk_frame_cache.enabled)
+        self.diskCacheCheck.setEnabled(gif_frame_cache.enabled)
+        self.diskCacheCheck.stateChanged.connect(self.toggle_disk_cache)
+
+        self.compositeCheck = QCheckBox("Draw overlays in one window per screen")
+        self.compositeCheck.setChecked(self.composite_mode)
+        self.compositeCheck.stateChanged.connect(self.toggle_composite_mode)
+
         self.autoStartCheck = QCheckBox("Run at Windows startup")
         self.autoStartCheck.setChecked(self.is_in_startup())
+        self.autoStartCheck.setEnabled(self.startup.available)
         self.autoStartCheck.stateChanged.connect(self.toggle_auto_start)
 
         layout.addWidget(self.preview)
         layout.addLayout(btnLayout)
         layout.addLayout(opacityLayout)
         layout.addWidget(self.clickThroughCheck)
+        layout.addWidget(self.selectedOnlyCheck)
         layout.addWidget(self.btnStart)
         layout.addWidget(listLabel)
         layout.addWidget(self.overlayList)
+        layout.addWidget(self.statusLabel)
+        layout.addWidget(self.memoryLabel)
         layout.addLayout(listBtnLayout)
+        layout.addLayout(layoutNameLayout)
         layout.addLayout(saveBtnLayout)
         layout.addWidget(settingsLabel)
         layout.addWidget(self.autoLoadCheck)
+        layout.addWidget(self.autoSaveCheck)
+        layout.addWidget(self.prewarmCheck)
+        layout.addWidget(self.gifCacheCheck)
+        layout.addWidget(self.diskCacheCheck)
+        layout.addWidget(self.compositeCheck)
         layout.addWidget(self.autoStartCheck)
 
         self.setLayout(layout)
+        self.update_status()
 
-        if self.auto_load_layout and os.path.exists(self.config_file):
-            self.load_layout()
+        QApplication.instance().screenAdded.connect(self.schedule_visibility_update)
+        QApplication.instance().screenRemoved.connect(self.schedule_visibility_update)
+        QApplication.instance().screenRemoved.connect(self.on_screen_removed)
+
+        if self.auto_load_layout and os.path.exists(self.layout_path(self.current_layout)):
+            self.load_layout(self.current_layout)
+
+        if self.prewarm_layouts:
+            self.prewarm_saved_layouts()
 
     def choose_file(self):
         file, _ = QFileDialog.getOpenFileName(
-            self, "Select Image", "", "Images (*.png *.jpg *.jpeg *.gif)"
+            self, "Select Image", "", "Images (*.png *.apng *.jpg *.jpeg *.gif *.webp)"
         )
         if not file:
             return
 
         self.file = file
 
-        if file.lower().endswith(".gif"):
+        if self.preview_key is not None:
+            image_store.release(self.preview_key)
+            self.preview_key = None
+
+        # QMovie plays GIF and WebP, an APNG previews its still default image
+        if sniff_animation(file) in ('gif', 'webp'):
             movie = QMovie(file)
             movie.setScaledSize(self.preview.size())
             self.preview.setMovie(movie)
             movie.start()
         else:
-            pix = QPixmap(file)
-            scaled = pix.scaled(
-                self.preview.size(), Qt.KeepAspectRatio, Qt.SmoothTransformation
-            )
-            self.preview.setPixmap(scaled)
+            self.preview_key = image_store.acquire(file)
+            size = self.preview.size()
+            self.preview.setPixmap(image_store.scaled(self.preview_key, size.width(), size.height()))
 
     def start_overlay(self):
         if self.file:
-            overlay = OverlayWindow(self.file, parent=self)
+            self.add_overlay(self.file)
+
+    def add_overlay(self, file, config=None):
+        """Create an overlay on top, with the controller's opacity and click-through unless config says otherwise"""
+        overlay = OverlayWindow(file, config, parent=self)
+        if config is None:
             overlay.set_opacity(self.opacitySlider.value())
             overlay.set_click_through(self.clickThroughCheck.isChecked())
-            overlay.show()
-            self.overlays.append(overlay)
-            self.update_overlay_list()
-            self.restore_z_order()
+        overlay.show()
+        self.overlayModel.add_overlay(overlay)
+        self.restore_z_order()
+        return overlay
 
     def update_opacity(self, value):
         self.opacityValue.setText(f"{value}%")
-        for overlay in self.overlays:
-            overlay.set_opacity(value)
+        self.queue_properties(self.target_overlays(), opacity=value / 100)
 
     def toggle_click_through(self, state):
-        enabled = state == Qt.Checked
-        for overlay in self.overlays:
-            overlay.set_click_through(enabled)
+        self.queue_properties(self.target_overlays(), click_through=state == Qt.Checked)
+
+    def selected_overlays(self):
+        rows = sorted(index.row() for index in self.overlayList.selectionModel().selectedRows())
+        return [self.overlays[row] for row in rows if row < len(self.overlays)]
+
+    def target_overlays(self):
+        """Overlays the opacity slider and click-through checkbox act on"""
+        if self.selectedOnlyCheck.isChecked():
+            return self.selected_overlays()
+        return self.overlays
+
+    def sync_property_controls(self, *args):
+        """Show the settings of the selected overlay while only the selection is targeted"""
+        selected = self.selected_overlays()
+        if not self.selectedOnlyCheck.isChecked() or not selected:
+            return
+        overlay = selected[0]
+        for control in (self.opacitySlider, self.clickThroughCheck):
+            control.blockSignals(True)
+        self.opacitySlider.setValue(round(overlay.opacity_value * 100))
+        self.opacityValue.setText(f"{self.opacitySlider.value()}%")
+        self.clickThroughCheck.setChecked(overlay.click_through)
+        for control in (self.opacitySlider, self.clickThroughCheck):
+            control.blockSignals(False)
+
+    def queue_properties(self, overlays, **properties):
+        """Record property changes, later changes to the same overlay replace earlier ones"""
+        for overlay in overlays:
+            self.pending_properties.setdefault(overlay, {}).update(properties)
+        if self.pending_properties and not self.property_timer.isActive():
+            self.property_timer.start()
+
+    def apply_pending_properties(self):
+        """Apply every merged change once, skipping overlays whose values did not change"""
+        pending = self.pending_properties
+        self.pending_properties = OrderedDict()
+        current = set(self.overlays)
+        for overlay, properties in pending.items():
+            if overlay in current:
+                overlay.apply_properties(properties)
 
     def update_overlay_list(self):
-        self.overlayList.clear()
-        for i, overlay in enumerate(self.overlays):
-            filename = os.path.basename(overlay.file)
-            
-            if overlay.isGif:
-                thumbnail = overlay.movie.currentPixmap()
-            else:
-                thumbnail = QPixmap(overlay.file)
-            
-            thumbnail = thumbnail.scaled(60, 60, Qt.KeepAspectRatio, Qt.SmoothTransformation)
-            
-            item = QListWidgetItem(f"{i+1}. {filename}")
-            item.setIcon(QIcon(thumbnail))
-            self.overlayList.addItem(item)
-    
-    def on_list_reorder(self):
+        """Refresh every row of the overlay list, regenerating thumbnails"""
+        start = time.perf_counter() if perf_stats.enabled else None
+        self.overlayModel.refresh()
+        if start is not None:
+            perf_stats.record('update_overlay_list', elapsed_ms(start))
+
+    def on_overlays_changed(self, *args):
+        self.schedule_visibility_update()
+        self.schedule_autosave()
+        self.update_status()
+
+    def on_list_reorder(self, *args):
         """Handle drag-and-drop reordering of overlays"""
-        new_order = []
-        for i in range(self.overlayList.count()):
-            item_text = self.overlayList.item(i).text()
-            original_index = int(item_text.split('.')[0]) - 1
-            new_order.append(original_index)
-        
-        self.overlays = [self.overlays[i] for i in new_order]
-        
         self.restore_z_order()
-        self.update_overlay_list()
-    
-    def restore_z_order(self):
-        """Restore z-order based on list position (bottom to top)"""
+        self.schedule_autosave()
+
+    def schedule_visibility_update(self, *args):
+        """Recompute overlay visibility shortly after geometry changes, also while a drag goes on"""
+        # Not restarted when already pending, or a continuous drag would postpone it forever
+        if not self.visibility_timer.isActive():
+            self.visibility_timer.start()
+
+    def update_visibility(self):
+        """Suspend overlays that are off-screen, minimized or covered by opaque overlays above them"""
+        screens = QRegion()
+        for screen in QApplication.screens():
+            screens += QRegion(screen.geometry())
+
+        covering = QRegion()
+        for overlay in reversed(self.paint_order()):
+            geometry = overlay.global_geometry()
+            visible = overlay.isVisible() and not overlay.isMinimized()
+            if visible:
+                exposed = QRegion(geometry).intersected(screens).subtracted(covering)
+                visible = not exposed.isEmpty()
+            overlay.set_suspended(not visible)
+            opaque = overlay.opaque_rect() if visible else QRect()
+            if not opaque.isEmpty():
+                covering += QRegion(opaque.translated(geometry.topLeft()).adjusted(1, 1, -1, -1))
+        self.enforce_memory_budget()
+        self.update_status()
+
+    def suspended_count(self):
+        return sum(1 for overlay in self.overlays if overlay.suspended)
+
+    def update_status(self):
+        self.statusLabel.setText(f"Suspended: {self.suspended_count()} of {len(self.overlays)} overlay(s)")
+        usage = self.memory_usage()
+        text = f"Memory: {format_bytes(sum(usage.values()))}"
+        if memory_accountant.budget_bytes:
+            text += f" of {format_bytes(memory_accountant.budget_bytes)}"
+        self.memoryLabel.setText(text)
+        self.memoryLabel.setToolTip("\n".join(f"{name}: {format_bytes(count)}" for name, count in usage.items()))
+
+    def memory_usage(self):
+        return memory_accountant.usage(self.overlays, self.overlayModel, self.preview)
+
+    def enforce_memory_budget(self):
+        # Pre-warmed images only speed up switching layouts and can't be trimmed: they go first
+        if self.prewarmed_keys and memory_accountant.over_budget(self.overlays, self.overlayModel, self.preview):
+            self.release_prewarmed()
+            print("Memory budget: released pre-warmed layout images")
+        freed = memory_accountant.enforce(self.overlays, self.overlayModel, self.preview)
+        if freed > 0:
+            print(f"Memory budget: freed {format_bytes(freed)}")
+
+    def memory_report(self):
+        """Print decoded bytes held per overlay against a full resolution decode"""
+        total_held = 0
+        total_full = 0
+        for i, overlay in enumerate(self.overlays):
+            held = overlay.bytes_held()
+            full = overlay.full_resolution_bytes()
+            total_held += held
+            total_full += full
+            print(f"{i+1}. {os.path.basename(overlay.file)}: "
+                  f"{format_bytes(held)} held (full resolution: {format_bytes(full)})")
+        print(f"Total: {format_bytes(total_held)} held (full resolution: {format_bytes(total_full)})")
+        for name, count in self.memory_usage().items():
+            print(f"  {name}: {format_bytes(count)}")
+        self.tray_icon.showMessage(
+            "Memory Report",
+            f"{len(self.overlays)} overlay(s): {format_bytes(total_held)} held, "
+            f"{format_bytes(total_full)} at full resolution",
+            QSystemTrayIcon.Information,
+            2000
+        )
+        return total_held, total_full
+
+    def paint_order(self):
+        """Overlays from bottom to top as they end up on screen"""
+        if not self.composite_mode:
+            return self.overlays
+        # Surfaces that ignore input sit below the interactive ones
+        return ([overlay for overlay in self.overlays if overlay.surface and overlay.surface.click_through] +
+                [overlay for overlay in self.overlays if not (overlay.surface and overlay.surface.click_through)])
+
+    def surface_for(self, overlay, pos=None):
+        """Composite surface for the screen under the overlay's center, created on first use"""
+        pos = overlay.global_pos() if pos is None else pos
+        center = QRect(pos, overlay.size()).center()
+        screen = QApplication.screenAt(center) or QApplication.primaryScreen()
+        key = (screen, overlay.click_through)
+        surface = self.surfaces.get(key)
+        if surface is None:
+            surface = self.surfaces[key] = CompositeSurface(screen, overlay.click_through)
+            for other in self.surfaces.values():
+                if not other.click_through:
+                    other.raise_()
+        return surface
+
+    def set_composite_mode(self, enabled):
+        self.composite_mode = enabled
         for overlay in self.overlays:
+            overlay.set_composited(enabled)
+        self.restore_z_order()
+
+    def toggle_composite_mode(self, state):
+        """Toggle drawing all overlays of a screen in one window"""
+        self.set_composite_mode(state == Qt.Checked)
+        self.save_settings()
+
+    def on_screen_removed(self, screen):
+        """Move overlays off the surfaces of a disconnected screen"""
+        for key in [key for key in self.surfaces if key[0] is screen]:
+            surface = self.surfaces.pop(key)
+            for overlay in list(surface.items):
+                overlay.set_composited(True)
+            surface.deleteLater()
+        self.restore_z_order()
+
+    def restore_z_order(self):
+        """Restore z-order based on list position (bottom to top) once a burst of changes settles"""
+        self.zorder_timer.start()
+
+    def note_raised(self, overlay):
+        """Record that overlay went to the top of the stack without being restacked by us"""
+        if overlay in self.window_stack:
+            self.window_stack.remove(overlay)
+        self.window_stack.append(overlay)
+
+    def apply_z_order(self):
+        """Restack only the overlays that are out of order, returns the number of windows moved
+
+        Top-level windows are only ever raised: stackUnder() does nothing for them, and
+        lowering a topmost window on Windows drops it out of the always-on-top band.
+        Overlays inside a composite surface are plain child widgets and may also be lowered.
+        """
+        self.zorder_timer.stop()
+        current = set(self.overlays)
+        stacked = [overlay for overlay in self.window_stack if overlay in current]
+        known = set(stacked)
+        stacked += [overlay for overlay in self.overlays if overlay not in known]
+        position = {overlay: i for i, overlay in enumerate(stacked)}
+
+        # The longest run of list entries that is already stacked in list order stays put,
+        # entries below it are lowered and entries above it raised
+        best_start, best_end, start = 0, 0, 0
+        for i, overlay in enumerate(self.overlays):
+            if i > 0 and position[overlay] < position[self.overlays[i - 1]]:
+                if not self.composite_mode:
+                    break
+                start = i
+            if i + 1 - start > best_end - best_start:
+                best_start, best_end = start, i + 1
+        lowered = self.overlays[:best_start]
+        raised = self.overlays[best_end:]
+        for overlay in reversed(lowered):
+            overlay.lower()
+        for overlay in raised:
             overlay.raise_()
 
+        self.window_stack = list(self.overlays)
+        if lowered or raised:
+            self.schedule_visibility_update()
+        return len(lowered) + len(raised)
+
     def remove_selected(self):
-        current_row = self.overlayList.currentRow()
-        if current_row >= 0 and current_row < len(self.overlays):
-            overlay = self.overlays[current_row]
-            overlay.close()
-            self.overlays.pop(current_row)
-            self.update_overlay_list()
+        rows = sorted((index.row() for index in self.overlayList.selectionModel().selectedRows()), reverse=True)
+        for row in rows:
+            if row < len(self.overlays):
+                overlay = self.overlayModel.remove_overlay(row)
+                overlay.close()
 
     def remove_all(self):
+        self.cancel_pending_load()
         for overlay in self.overlays:
             overlay.close()
-        self.overlays.clear()
-        self.update_overlay_list()
-
-    def save_layout(self):
-        """Save all overlay positions and settings"""
+        self.overlayModel.clear()
+
+    def layout_path(self, name):
+        """File a named layout is stored in"""
+        if name == DEFAULT_LAYOUT_NAME:
+            return self.config_file
+        return os.path.join(self.layouts_dir, f"{name}.json")
+
+    def layout_names(self):
+        names = [DEFAULT_LAYOUT_NAME]
+        for file in sorted(os.listdir(self.layouts_dir)):
+            if file.endswith('.json') and file[:-5] != DEFAULT_LAYOUT_NAME:
+                names.append(file[:-5])
+        return names
+
+    def selected_layout_name(self):
+        """Layout name typed or picked in the combo box, made safe to use as a file name"""
+        name = self.layoutCombo.currentText().strip()
+        name = ''.join('_' if c in LAYOUT_NAME_FORBIDDEN else c for c in name)
+        return name or DEFAULT_LAYOUT_NAME
+
+    def refresh_layout_names(self):
+        current = self.layoutCombo.currentText()
+        self.layoutCombo.blockSignals(True)
+        self.layoutCombo.clear()
+        self.layoutCombo.addItems(self.layout_names())
+        self.layoutCombo.setCurrentText(current)
+        self.layoutCombo.blockSignals(False)
+
+    def write_layout(self, name):
+        """Atomically write the current overlays as layout name"""
+        layout_file = self.layout_path(name)
         config = {
+            'version': LAYOUT_FORMAT_VERSION,
             'overlays': [overlay.get_config() for overlay in self.overlays]
         }
+        write_json_atomic(layout_file, config)
+        return layout_file
+
+    def schedule_autosave(self):
+        """Merge a burst of changes into one write once the user goes idle"""
+        if self.autosave_layout:
+            self.autosave_timer.start()
+
+    def autosave(self):
+        if self.pending_layout is not None:
+            # Don't save a half-loaded layout, try again once loading settles
+            self.autosave_timer.start()
+            return
+        try:
+            self.write_layout(self.current_layout)
+        except Exception as e:
+            print(f"Error auto-saving layout: {e}")
+
+    def toggle_autosave(self, state):
+        """Toggle automatic saving of the current layout"""
+        self.autosave_layout = state == Qt.Checked
+        self.save_settings()
+        self.schedule_autosave()
+
+    def save_layout(self, name=None):
+        """Save all overlay positions and settings"""
+        name = name or self.selected_layout_name()
         try:
-            with open(self.config_file, 'w') as f:
-                json.dump(config, f, indent=2)
-            print(f"Layout saved to {self.config_file}")
+            layout_file = self.write_layout(name)
+            print(f"Layout saved to {layout_file}")
+            self.current_layout = name
+            self.save_settings()
+            self.refresh_layout_names()
             self.tray_icon.showMessage(
                 "Layout Saved",
-                f"Saved {len(self.overlays)} overlay(s)",
+                f"Saved {len(self.overlays)} overlay(s) to \"{name}\"",
                 QSystemTrayIcon.Information,
                 2000
             )
+            if self.prewarm_layouts:
+                self.prewarm_saved_layouts()
         except Exception as e:
             print(f"Error saving layout: {e}")
 
-    def load_layout(self):
+    def load_layout(self, name=None):
         """Load overlay positions and settings"""
-        if not os.path.exists(self.config_file):
-            print(f"No saved layout found at {self.config_file}")
+        name = name or self.selected_layout_name()
+        layout_file = self.layout_path(name)
+        if not os.path.exists(layout_file):
+            print(f"No saved layout found at {layout_file}")
             self.tray_icon.showMessage(
                 "No Layout Found",
                 "No saved layout to load",
@@ -380,35 +3134,226 @@ class MainWindow(QWidget):
             return
 
         try:
-            with open(self.config_file, 'r') as f:
+            with open(layout_file, 'r') as f:
                 config = json.load(f)
-            
-            self.remove_all()
-            
-            loaded_count = 0
-            for overlay_config in config.get('overlays', []):
-                if os.path.exists(overlay_config['file']):
-                    overlay = OverlayWindow(overlay_config['file'], overlay_config, parent=self)
-                    overlay.show()
-                    self.overlays.append(overlay)
-                    loaded_count += 1
-                else:
-                    print(f"Image file not found: {overlay_config['file']}")
-            
-            self.restore_z_order()
-            self.update_overlay_list()
-            print(f"Layout loaded: {loaded_count} overlay(s) from {self.config_file}")
-            
-            if loaded_count > 0:
-                self.tray_icon.showMessage(
-                    "Layout Loaded",
-                    f"Loaded {loaded_count} overlay(s)",
-                    QSystemTrayIcon.Information,
-                    2000
-                )
+            if config.get('version', 1) > LAYOUT_FORMAT_VERSION:
+                print(f"{layout_file} was written by a newer version, loading what is understood")
+            self.current_layout = name
+            self.save_settings()
+            self.apply_layout(config.get('overlays', []), layout_file)
         except Exception as e:
             print(f"Error loading layout: {e}")
 
+    def cancel_pending_load(self):
+        """Ignore decode results still in flight from an earlier load"""
+        self.layout_generation += 1
+        self.pending_layout = None
+
+    def apply_layout(self, entries, source):
+        """Diff saved entries against the live overlays
+
+        Windows showing a file that is in the layout are kept and only get their
+        geometry, rotation, opacity and click-through updated. Windows not in the
+        layout are closed, and only genuinely new entries are decoded and created.
+        """
+        started = time.perf_counter()
+        self.cancel_pending_load()
+
+        available = {}
+        for overlay in self.overlays:
+            available.setdefault(image_store.key_for(overlay.file)[0], []).append(overlay)
+
+        kept = {}
+        new_slots = []
+        for slot, overlay_config in enumerate(entries):
+            candidates = available.get(image_store.key_for(overlay_config['file'])[0])
+            if candidates:
+                overlay = candidates.pop(0)
+                overlay.apply_config(overlay_config)
+                kept[slot] = overlay
+            else:
+                new_slots.append(slot)
+
+        removed_count = 0
+        for leftovers in available.values():
+            for overlay in leftovers:
+                self.overlayModel.remove_overlay(self.overlayModel.row_of(overlay.overlay_id))
+                overlay.close()
+                removed_count += 1
+
+        for target_row, slot in enumerate(sorted(kept)):
+            self.overlayModel.move_overlay(self.overlayModel.row_of(kept[slot].overlay_id), target_row)
+
+        pending = self.pending_layout = {
+            'source': source, 'configs': {}, 'loaded_slots': sorted(kept), 'missing': [], 'remaining': 0,
+            'kept_slots': set(kept), 'removed': removed_count, 'placeholders': {}, 'started': started,
+            'slots': {overlay.overlay_id: slot for slot, overlay in kept.items()}
+        }
+
+        # Images are decoded on the thread pool and windows appear as their image arrives,
+        # unless the shared store (e.g. a pre-warmed layout) already holds the decode
+        ready_slots = []
+        pool = self.decode_pool
+        ratio = new_window_pixel_ratio()
+
+        # Kept overlays can still be waiting for a decode the cancelled load had started
+        for slot, overlay in kept.items():
+            if overlay.awaiting_decode():
+                pending['configs'][slot] = entries[slot]
+                pending['remaining'] += 1
+                pending['placeholders'][slot] = overlay
+                pool.start(DecodeTask(self.layout_generation, slot, overlay.file, entries[slot],
+                                      self.decode_signals, ratio))
+
+        for slot in new_slots:
+            overlay_config = entries[slot]
+            file = overlay_config['file']
+            if not os.path.exists(file):
+                print(f"Image file not found: {file}")
+                pending['missing'].append(file)
+                continue
+            pending['configs'][slot] = overlay_config
+            pending['remaining'] += 1
+            size = QSize(overlay_config.get('width', MAX_INITIAL_SIDE),
+                         overlay_config.get('height', MAX_INITIAL_SIDE)) * ratio
+            if not sniff_animation(file) and image_store.has_decoded(file, size.width(), size.height()):
+                ready_slots.append(slot)
+                continue
+
+            # Layouts with embedded thumbnails get their window and list row right away
+            placeholder = decode_thumbnail(overlay_config.get('thumbnail'))
+            if placeholder is not None:
+                try:
+                    overlay = OverlayWindow(file, overlay_config, parent=self, placeholder=placeholder)
+                    overlay.show()
+                    self.insert_loaded_overlay(slot, overlay)
+                    pending['placeholders'][slot] = overlay
+                except Exception as e:
+                    print(f"Error creating overlay for {file}: {e}")
+            pool.start(DecodeTask(self.layout_generation, slot, file, overlay_config, self.decode_signals, ratio))
+
+        for slot in ready_slots:
+            self.on_overlay_decoded(self.layout_generation, slot, {})
+
+        if pending['remaining'] == 0 and self.pending_layout is pending:
+            self.finish_layout_load()
+
+    def on_overlay_decoded(self, generation, slot, result):
+        """Create the window for a layout entry once its image has been decoded"""
+        pending = self.pending_layout
+        if generation != self.layout_generation or pending is None:
+            return
+        overlay_config = pending['configs'][slot]
+        placeholder_overlay = pending['placeholders'].pop(slot, None)
+        if 'error' in result:
+            print(f"Error decoding {overlay_config['file']}: {result['error']}")
+            pending['missing'].append(overlay_config['file'])
+            if placeholder_overlay in self.overlays:
+                self.overlayModel.remove_overlay(self.overlayModel.row_of(placeholder_overlay.overlay_id))
+                placeholder_overlay.close()
+        elif placeholder_overlay is not None:
+            if placeholder_overlay in self.overlays:
+                placeholder_overlay.finish_decode(result)
+        else:
+            try:
+                overlay = OverlayWindow(overlay_config['file'], overlay_config, parent=self, decoded=result)
+                overlay.show()
+                self.insert_loaded_overlay(slot, overlay)
+            except Exception as e:
+                print(f"Error creating overlay for {overlay_config['file']}: {e}")
+                pending['missing'].append(overlay_config['file'])
+
+        pending['remaining'] -= 1
+        if pending['remaining'] == 0:
+            self.finish_layout_load()
+
+    def insert_loaded_overlay(self, slot, overlay):
+        """Keep the saved order in the list even though images arrive out of order"""
+        pending = self.pending_layout
+        row = bisect.bisect(pending['loaded_slots'], slot)
+        pending['loaded_slots'].insert(row, slot)
+        pending['slots'][overlay.overlay_id] = slot
+        self.overlayModel.insert_overlay(row, overlay)
+
+    def on_overlays_removing(self, parent, first, last):
+        """Overlays of the layout being loaded that get removed no longer count as loaded"""
+        pending = self.pending_layout
+        if pending is None:
+            return
+        for overlay in self.overlays[first:last + 1]:
+            slot = pending['slots'].pop(overlay.overlay_id, None)
+            if slot is not None:
+                pending['loaded_slots'].remove(slot)
+                pending['kept_slots'].discard(slot)
+
+    def finish_layout_load(self):
+        """All layout entries arrived: apply the saved z-order and report"""
+        pending = self.pending_layout
+        self.pending_layout = None
+        loaded_count = len(pending['loaded_slots'])
+        kept_count = len(pending['kept_slots'])
+        if perf_stats.enabled:
+            perf_stats.record('load_layout', elapsed_ms(pending['started']))
+
+        self.restore_z_order()
+        print(f"Layout loaded: {loaded_count} overlay(s) from {pending['source']} "
+              f"({kept_count} kept, {loaded_count - kept_count} created, {pending['removed']} removed)")
+
+        if pending['missing']:
+            self.tray_icon.showMessage(
+                "Layout Loaded",
+                f"Loaded {loaded_count} overlay(s), {len(pending['missing'])} could not be loaded",
+                QSystemTrayIcon.Warning,
+                2000
+            )
+        elif loaded_count > 0:
+            self.tray_icon.showMessage(
+                "Layout Loaded",
+                f"Loaded {loaded_count} overlay(s)",
+                QSystemTrayIcon.Information,
+                2000
+            )
+
+    def prewarm_saved_layouts(self):
+        """Decode the still images of every saved layout into the shared store so switching is near-instant"""
+        self.release_prewarmed()
+        pool = self.decode_pool
+        ratio = new_window_pixel_ratio()
+        for name in self.layout_names():
+            try:
+                with open(self.layout_path(name), 'r') as f:
+                    entries = json.load(f).get('overlays', [])
+            except (OSError, ValueError):
+                continue
+            for overlay_config in entries:
+                file = overlay_config['file']
+                if not os.path.exists(file) or sniff_animation(file):
+                    continue
+                self.prewarm_paths.append(file)
+                pool.start(DecodeTask(self.prewarm_generation, len(self.prewarm_paths) - 1, file,
+                                      overlay_config, self.prewarm_signals, ratio))
+
+    def on_prewarm_decoded(self, generation, slot, result):
+        if generation != self.prewarm_generation or 'image' not in result:
+            return
+        self.prewarmed_keys.append(image_store.acquire(self.prewarm_paths[slot], result['image']))
+
+    def release_prewarmed(self):
+        self.prewarm_generation += 1
+        self.prewarm_paths = []
+        for key in self.prewarmed_keys:
+            image_store.release(key)
+        self.prewarmed_keys = []
+
+    def toggle_prewarm(self, state):
+        """Toggle pre-warming of saved layouts"""
+        self.prewarm_layouts = state == Qt.Checked
+        self.save_settings()
+        if self.prewarm_layouts:
+            self.prewarm_saved_layouts()
+        else:
+            self.release_prewarmed()
+
     def setup_tray(self):
         """Setup system tray icon"""
         self.tray_icon = QSystemTrayIcon(self)
@@ -428,6 +3373,27 @@ class MainWindow(QWidget):
         hide_action.triggered.connect(self.hide)
         tray_menu.addAction(hide_action)
         
+        fps_menu = tray_menu.addMenu("Animation FPS")
+        fps_group = QActionGroup(self)
+        for fps, label in ANIMATION_FPS_CHOICES:
+            fps_action = QAction(label, self, checkable=True)
+            fps_action.setChecked(fps == animation_clock.fps_cap)
+            fps_action.triggered.connect(lambda checked, fps=fps: self.set_animation_fps(fps))
+            fps_group.addAction(fps_action)
+            fps_menu.addAction(fps_action)
+
+        memory_action = QAction("Memory Report", self)
+        memory_action.triggered.connect(self.memory_report)
+        tray_menu.addAction(memory_action)
+
+        performance_action = QAction("Performance", self)
+        performance_action.triggered.connect(self.show_performance_panel)
+        tray_menu.addAction(performance_action)
+
+        clear_cache_action = QAction("Clear Frame Cache", self)
+        clear_cache_action.triggered.connect(self.clear_frame_cache)
+        tray_menu.addAction(clear_cache_action)
+
         tray_menu.addSeparator()
         
         quit_action = QAction("Exit", self)
@@ -461,8 +3427,23 @@ class MainWindow(QWidget):
             self.show()
             self.activateWindow()
 
+    def show_performance_panel(self):
+        self.performance_panel.show()
+        self.performance_panel.raise_()
+        self.performance_panel.activateWindow()
+
+    def dump_performance(self, path=None):
+        """Write the recorded performance statistics as JSON (to the trace file by default)"""
+        path = path or self.perf_trace_file
+        try:
+            write_json_atomic(path, perf_stats.snapshot(self.overlays))
+        except Exception as e:
+            print(f"Error writing performance data: {e}")
+
     def quit_application(self):
         """Properly quit the application"""
+        if self.perf_trace_file:
+            self.dump_performance()
         self.remove_all()
         self.tray_icon.hide()
         QApplication.quit()
@@ -470,22 +3451,51 @@ class MainWindow(QWidget):
     def load_settings(self):
         """Load application settings"""
         self.auto_load_layout = False
+        self.autosave_layout = False
+        self.current_layout = DEFAULT_LAYOUT_NAME
+        self.prewarm_layouts = False
+        self.gif_cache_budget_mb = DEFAULT_GIF_CACHE_BUDGET_MB
+        self.disk_cache_limit_mb = DEFAULT_DISK_CACHE_LIMIT_MB
+        self.composite_mode = False
+        self.memory_budget_mb = DEFAULT_MEMORY_BUDGET_MB
         if os.path.exists(self.settings_file):
             try:
                 with open(self.settings_file, 'r') as f:
                     settings = json.load(f)
                     self.auto_load_layout = settings.get('auto_load_layout', False)
+                    self.current_layout = settings.get('current_layout', DEFAULT_LAYOUT_NAME)
+                    self.autosave_layout = settings.get('autosave_layout', False)
+                    self.prewarm_layouts = settings.get('prewarm_layouts', False)
+                    gif_frame_cache.enabled = settings.get('gif_frame_cache', True)
+                    self.gif_cache_budget_mb = settings.get('gif_cache_budget_mb', DEFAULT_GIF_CACHE_BUDGET_MB)
+                    disk_frame_cache.enabled = settings.get('disk_frame_cache', False)
+                    self.disk_cache_limit_mb = settings.get('disk_cache_limit_mb', DEFAULT_DISK_CACHE_LIMIT_MB)
+                    self.composite_mode = settings.get('composite_mode', False)
+                    self.memory_budget_mb = settings.get('memory_budget_mb', DEFAULT_MEMORY_BUDGET_MB)
+                    animation_clock.set_fps_cap(settings.get('animation_fps_cap', 0))
             except Exception as e:
                 print(f"Error loading settings: {e}")
+        gif_frame_cache.set_budget(self.gif_cache_budget_mb * 1024 * 1024)
+        disk_frame_cache.limit_bytes = self.disk_cache_limit_mb * 1024 * 1024
+        memory_accountant.budget_bytes = self.memory_budget_mb * 1024 * 1024
 
     def save_settings(self):
         """Save application settings"""
         settings = {
-            'auto_load_layout': self.auto_load_layout
+            'auto_load_layout': self.auto_load_layout,
+            'current_layout': self.current_layout,
+            'autosave_layout': self.autosave_layout,
+            'prewarm_layouts': self.prewarm_layouts,
+            'gif_frame_cache': gif_frame_cache.enabled,
+            'gif_cache_budget_mb': self.gif_cache_budget_mb,
+            'disk_frame_cache': disk_frame_cache.enabled,
+            'disk_cache_limit_mb': self.disk_cache_limit_mb,
+            'composite_mode': self.composite_mode,
+            'memory_budget_mb': self.memory_budget_mb,
+            'animation_fps_cap': animation_clock.fps_cap
         }
         try:
-            with open(self.settings_file, 'w') as f:
-                json.dump(settings, f, indent=2)
+            write_json_atomic(self.settings_file, settings)
         except Exception as e:
             print(f"Error saving settings: {e}")
 
@@ -494,20 +3504,45 @@ class MainWindow(QWidget):
         self.auto_load_layout = state == Qt.Checked
         self.save_settings()
 
+    def set_animation_fps(self, fps):
+        """Cap the shared animation clock (0 = display refresh rate)"""
+        animation_clock.set_fps_cap(fps)
+        self.save_settings()
+
+    def toggle_gif_cache(self, state):
+        """Toggle pre-decoding of GIF frames"""
+        gif_frame_cache.enabled = state == Qt.Checked
+        self.diskCacheCheck.setEnabled(gif_frame_cache.enabled)
+        self.save_settings()
+        self.rebuild_frame_caches()
+
+    def toggle_disk_cache(self, state):
+        """Toggle keeping decoded GIF frames in memory-mapped files on disk"""
+        disk_frame_cache.enabled = state == Qt.Checked
+        self.save_settings()
+        self.rebuild_frame_caches()
+
+    def rebuild_frame_caches(self):
+        for overlay in self.overlays:
+            if overlay.isAnimated:
+                overlay.build_frame_cache()
+        self.update_overlay_list()
+
+    def clear_frame_cache(self):
+        """Delete the on-disk frame cache (files mapped by open overlays are kept)"""
+        remaining = disk_frame_cache.clear()
+        print(f"Frame cache cleared, {format_bytes(remaining)} still in use")
+        self.tray_icon.showMessage(
+            "Frame Cache",
+            f"Frame cache cleared ({format_bytes(remaining)} still in use)",
+            QSystemTrayIcon.Information,
+            2000
+        )
+
     def is_in_startup(self):
         """Check if app is in Windows startup"""
         try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                                r"Software\Microsoft\Windows\CurrentVersion\Run", 
-                                0, winreg.KEY_READ)
-            try:
-                value, _ = winreg.QueryValueEx(key, self.app_name)
-                winreg.CloseKey(key)
-                current_exe = os.path.abspath(sys.argv[0])
-                return value.strip('"') == current_exe
-            except FileNotFoundError:
-                winreg.CloseKey(key)
-                return False
+            return self.startup.is_enabled()
         except Exception as e:
             print(f"Error checking startup: {e}")
             return False
@@ -515,55 +3550,14 @@ class MainWindow(QWidget):
     def cleanup_old_startup_entries(self):
         """Remove old/duplicate startup entries"""
         try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                                r"Software\Microsoft\Windows\CurrentVersion\Run", 
-                                0, winreg.KEY_ALL_ACCESS)
-            
-            current_exe = os.path.abspath(sys.argv[0])
-            
-            old_names = ["OverlayController", "DesktopOverlay by Ameno", "Desktop Overlay"]
-            
-            for old_name in old_names:
-                if old_name != self.app_name:
-                    try:
-                        winreg.DeleteValue(key, old_name)
-                        print(f"Removed old startup entry: {old_name}")
-                    except FileNotFoundError:
-                        pass
-            
-            try:
-                value, _ = winreg.QueryValueEx(key, self.app_name)
-                if value.strip('"') != current_exe:
-                    winreg.DeleteValue(key, self.app_name)
-                    print(f"Removed outdated startup entry for {self.app_name}")
-            except FileNotFoundError:
-                pass
-            
-            winreg.CloseKey(key)
+            self.startup.cleanup()
         except Exception as e:
             print(f"Error cleaning up startup entries: {e}")
 
     def toggle_auto_start(self, state):
         """Toggle Windows startup"""
         try:
-            key = winreg.OpenKey(winreg.HKEY_CURRENT_USER, 
-                                r"Software\Microsoft\Windows\CurrentVersion\Run", 
-                                0, winreg.KEY_WRITE)
-            
-            if state == Qt.Checked:
-                exe_path = os.path.abspath(sys.argv[0])
-                if ' ' in exe_path:
-                    exe_path = f'"{exe_path}"'
-                winreg.SetValueEx(key, self.app_name, 0, winreg.REG_SZ, exe_path)
-                print(f"Added to startup: {exe_path}")
-            else:
-                try:
-                    winreg.DeleteValue(key, self.app_name)
-                    print("Removed from startup")
-                except FileNotFoundError:
-                    pass
-            
-            winreg.CloseKey(key)
+            self.startup.set_enabled(state == Qt.Checked)
         except Exception as e:
             print(f"Error toggling startup: {e}")
 
@@ -579,14 +3573,324 @@ class MainWindow(QWidget):
         )
 
 
-app = QApplication(sys.argv)
-
-shared_memory = QSharedMemory("DesktopOverlayApp")
-if not shared_memory.create(1):
-    print("Application is already running!")
-    sys.exit(0)
-
-app.setQuitOnLastWindowClosed(False)
-window = MainWindow()
-window.show()
-sys.exit(app.exec_())
\ No newline at end of file
+def is_layout_name(name):
+    """True if name can be used as a layout file name as it is, without leaving the layouts folder"""
+    return (isinstance(name, str) and name == name.strip() and name not in ('', '.', '..')
+            and not any(c in LAYOUT_NAME_FORBIDDEN or ord(c) < 32 for c in name))
+
+
+class ControlServer(QObject):
+    """Local socket server that lets repeat launches and scripts drive the running instance
+
+    Clients send one JSON object per line: a single command such as
+    {"cmd": "add", "file": "C:/cat.gif", "position": [100, 100]} or a batch
+    {"commands": [...]}. A batch is validated as a whole (fields, value types and
+    ranges, overlay ids, readable image files) before anything runs, then executed in
+    one go, so the debounced visibility, z-order and autosave passes run once for the
+    whole batch. Every request is answered with one JSON line holding
+    "ok", "results" or "error", and the time it took in "latency_ms".
+    """
+
+    OVERLAY_FIELDS = ('width', 'height', 'rotation', 'opacity', 'click_through', 'position')
+    REQUIRED_FIELDS = {
+        'add': ('file',),
+        'update': ('overlay',),
+        'move': ('overlay', 'position'),
+        'remove': ('overlay',),
+        'reorder': ('overlay', 'row'),
+    }
+
+    def __init__(self, controller, name=CONTROL_SERVER_NAME):
+        super().__init__(controller)
+        self.controller = controller
+        self.name = name
+        self.server = QLocalServer(self)
+        self.server.newConnection.connect(self.on_new_connection)
+        self.requests = 0
+        self.total_latency_ms = 0.0
+        self.max_latency_ms = 0.0
+
+    def listen(self):
+        # Clear a socket left behind by an instance that crashed
+        QLocalServer.removeServer(self.name)
+        # Only the user running the app may send it commands
+        self.server.setSocketOptions(QLocalServer.UserAccessOption)
+        if not self.server.listen(self.name):
+            print(f"Control server could not listen: {self.server.errorString()}")
+            return False
+        return True
+
+    def on_new_connection(self):
+        while self.server.hasPendingConnections():
+            socket = self.server.nextPendingConnection()
+            socket.readyRead.connect(lambda socket=socket: self.on_ready_read(socket))
+            socket.disconnected.connect(socket.deleteLater)
+
+    def on_ready_read(self, socket):
+        while socket.canReadLine():
+            line = bytes(socket.readLine()).strip()
+            if line:
+                socket.write(json.dumps(self.execute_line(line)).encode() + b'\n')
+        socket.flush()
+
+    def execute_line(self, line):
+        try:
+            request = json.loads(line)
+        except ValueError as e:
+            return {'ok': False, 'error': f"invalid JSON: {e}"}
+        if not isinstance(request, dict):
+            return {'ok': False, 'error': "request must be a JSON object"}
+        return self.execute(request)
+
+    def execute(self, request):
+        """Run a command or a batch of commands and return the response"""
+        timer = QElapsedTimer()
+        timer.start()
+        commands = request.get('commands', [request])
+        try:
+            if not isinstance(commands, list):
+                raise ValueError("commands must be a list")
+            for index, command in enumerate(commands):
+                self.validate(index, command)
+        except ValueError as e:
+            response = {'ok': False, 'error': str(e)}
+        else:
+            results = []
+            try:
+                for command in commands:
+                    results.append(self.run(command))
+                response = {'ok': True, 'results': results}
+            except Exception as e:
+                # Commands before the failing one stay applied, tell the client which those are
+                response = {'ok': False, 'results': results,
+                            'error': f"command {len(results)}: {type(e).__name__}: {e}"}
+
+        latency = timer.nsecsElapsed() / 1e6
+        self.requests += 1
+        self.total_latency_ms += latency
+        self.max_latency_ms = max(self.max_latency_ms, latency)
+        response['latency_ms'] = round(latency, 3)
+        if 'id' in request:
+            response['id'] = request['id']
+        return response
+
+    def validate(self, index, command):
+        """Reject a batch up front instead of leaving it half applied"""
+        if not isinstance(command, dict):
+            raise ValueError(f"command {index}: must be a JSON object")
+        name = command.get('cmd')
+        if not hasattr(self, f"cmd_{name}"):
+            raise ValueError(f"command {index}: unknown command {name!r}")
+        for field in self.REQUIRED_FIELDS.get(name, ()):
+            if field not in command:
+                raise ValueError(f"command {index}: {field!r} is required")
+        for field, value in command.items():
+            error = self.field_error(field, value)
+            if error:
+                raise ValueError(f"command {index}: {field!r} {error}")
+        for file in command.get('files', []) + ([command['file']] if 'file' in command else []):
+            if not os.path.exists(file):
+                raise ValueError(f"command {index}: file not found: {file}")
+            if not QImageReader(file).canRead():
+                raise ValueError(f"command {index}: not a readable image: {file}")
+        overlay_id = command.get('overlay')
+        if overlay_id is not None and not (overlay_id == 'all' and name != 'reorder'):
+            if self.controller.overlayModel.row_of(overlay_id) is None:
+                raise ValueError(f"command {index}: no overlay with id {overlay_id!r}")
+
+    def field_error(self, field, value):
+        """Why value is not acceptable for field, None if it is"""
+        # json.loads accepts NaN and Infinity, which no geometry can use
+        number = isinstance(value, (int, float)) and not isinstance(value, bool) and math.isfinite(value)
+        integer = isinstance(value, int) and not isinstance(value, bool)
+        if field in ('width', 'height'):
+            if not integer or not 1 <= value <= MAX_OVERLAY_SIDE:
+                return f"must be an integer from 1 to {MAX_OVERLAY_SIDE}"
+        elif field == 'rotation':
+            if not number:
+                return "must be a finite number"
+        elif field == 'opacity':
+            if not number or not 0.1 <= value <= 1:
+                return "must be a finite number from 0.1 to 1"
+        elif field == 'click_through':
+            if not isinstance(value, bool):
+                return "must be true or false"
+        elif field == 'position':
+            if not (isinstance(value, list) and len(value) == 2 and
+                    all(isinstance(v, int) and not isinstance(v, bool) for v in value)):
+                return "must be a list of two integers"
+        elif field == 'row':
+            if not integer:
+                return "must be an integer"
+        elif field == 'overlay':
+            if not (integer or value == 'all'):
+                return "must be an overlay id or \"all\""
+        elif field == 'file':
+            if not isinstance(value, str):
+                return "must be a string"
+        elif field == 'files':
+            if not (isinstance(value, list) and all(isinstance(v, str) for v in value)):
+                return "must be a list of strings"
+        elif field == 'name':
+            if not is_layout_name(value):
+                return "is not a valid layout name"
+        elif field == 'overlays':
+            if not (isinstance(value, list) and
+                    all(isinstance(v, dict) and isinstance(v.get('file'), str) for v in value)):
+                return "must be a list of objects with a 'file'"
+            for entry in value:
+                for key in self.OVERLAY_FIELDS:
+                    error = self.field_error(key, entry[key]) if key in entry else None
+                    if error:
+                        return f"entry {key!r} {error}"
+        return None
+
+    def run(self, command):
+        return getattr(self, f"cmd_{command['cmd']}")(command)
+
+    def targets(self, command):
+        if command['overlay'] == 'all':
+            return list(self.controller.overlays)
+        return [self.controller.overlays[self.controller.overlayModel.row_of(command['overlay'])]]
+
+    def overlay_config(self, command):
+        return {key: command[key] for key in self.OVERLAY_FIELDS if key in command}
+
+    def describe(self, overlay):
+        config = overlay.get_config()
+        del config['thumbnail']
+        return dict(config, overlay=overlay.overlay_id)
+
+    def cmd_ping(self, command):
+        return {}
+
+    def cmd_show(self, command):
+        self.controller.show()
+        self.controller.activateWindow()
+        return {}
+
+    def cmd_open(self, command):
+        """Files forwarded by a second launch"""
+        if not command.get('files'):
+            return self.cmd_show(command)
+        return {'overlays': [self.controller.add_overlay(file).overlay_id for file in command['files']]}
+
+    def cmd_add(self, command):
+        config = self.overlay_config(command) or None
+        return {'overlay': self.controller.add_overlay(command['file'], config).overlay_id}
+
+    def cmd_update(self, command):
+        changes = self.overlay_config(command)
+        for overlay in self.targets(command):
+            config = overlay.get_config()
+            if 'width' in changes or 'height' in changes:
+                # A side left out follows the image's aspect ratio, as when resizing with the wheel
+                del config['width'], config['height']
+            overlay.apply_config(dict(config, **changes))
+        return {}
+
+    def cmd_move(self, command):
+        return self.cmd_update({'overlay': command['overlay'], 'position': command['position']})
+
+    def cmd_remove(self, command):
+        model = self.controller.overlayModel
+        for overlay in self.targets(command):
+            model.remove_overlay(model.row_of(overlay.overlay_id)).close()
+        return {}
+
+    def cmd_reorder(self, command):
+        """Move an overlay to list row (0 = bottom)"""
+        model = self.controller.overlayModel
+        source = model.row_of(command['overlay'])
+        row = max(0, min(int(command['row']), len(self.controller.overlays) - 1))
+        model.move_overlay(source, row + 1 if row > source else row)
+        return {}
+
+    def cmd_list(self, command):
+        return {'overlays': [self.describe(overlay) for overlay in self.controller.overlays]}
+
+    def cmd_load_layout(self, command):
+        """Images decode in the background, poll list to see them arrive"""
+        self.controller.load_layout(command.get('name', DEFAULT_LAYOUT_NAME))
+        return {'pending': self.controller.pending_layout is not None}
+
+    def cmd_apply_layout(self, command):
+        self.controller.apply_layout(command.get('overlays', []), "control request")
+        return {'pending': self.controller.pending_layout is not None}
+
+    def cmd_save_layout(self, command):
+        return {'path': self.controller.write_layout(command.get('name', self.controller.current_layout))}
+
+    def cmd_stats(self, command):
+        average = self.total_latency_ms / self.requests if self.requests else 0.0
+        return {'requests': self.requests, 'average_latency_ms': round(average, 3),
+                'max_latency_ms': round(self.max_latency_ms, 3), 'overlays': len(self.controller.overlays)}
+
+
+def control_request_from_args(args):
+    """Request for the command line: --command JSON, files to open, or just showing the controller
+
+    Raises ValueError if --command is not followed by a JSON object.
+    """
+    if args and args[0] == '--command':
+        if len(args) < 2:
+            raise ValueError("--command needs a JSON request")
+        request = json.loads(args[1])
+        if not isinstance(request, dict):
+            raise ValueError("the request must be a JSON object")
+        return request
+    files = [os.path.abspath(arg) for arg in args if not arg.startswith('-')]
+    return {'cmd': 'open', 'files': files}
+
+
+def send_control_request(request, name=CONTROL_SERVER_NAME, timeout_ms=CONTROL_TIMEOUT_MS):
+    """Send one request to the running instance and wait for its answer, None if it can't be reached"""
+    socket = QLocalSocket()
+    socket.connectToServer(name)
+    if not socket.waitForConnected(timeout_ms):
+        return None
+    socket.write(json.dumps(request).encode() + b'\n')
+    socket.flush()
+    while not socket.canReadLine():
+        if not socket.waitForReadyRead(timeout_ms):
+            return None
+    response = json.loads(bytes(socket.readLine()))
+    socket.disconnectFromServer()
+    return response
+
+
+def main(argv=None):
+    argv = sys.argv if argv is None else argv
+    try:
+        startup_request = control_request_from_args(argv[1:])
+    except ValueError as e:
+        print(f"Invalid --command: {e}")
+        print("Usage: overlay.py [image files...] | --command '{\"cmd\": \"ping\"}'")
+        return 2
+    app = QApplication(argv)
+
+    shared_memory = QSharedMemory("DesktopOverlayApp")
+    if not shared_memory.create(1):
+        # Hand the request to the running instance instead of starting a second one
+        response = send_control_request(startup_request)
+        if response is None:
+            print("Application is already running!")
+            return 1
+        if '--command' in argv or not response['ok']:
+            print(json.dumps(response))
+        return 0 if response['ok'] else 1
+
+    app.setQuitOnLastWindowClosed(False)
+    window = MainWindow()
+    control_server = ControlServer(window)
+    control_server.listen()
+    if '--command' in argv or startup_request.get('files'):
+        response = control_server.execute(startup_request)
+        if '--command' in argv or not response['ok']:
+            print(json.dumps(response))
+    window.show()
+    return app.exec_()
+
+
+if __name__ == "__main__":
+    sys.exit(main())
\ No newline at end of file
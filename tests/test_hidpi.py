@@ -0,0 +1,222 @@
+"""Overlays render at device pixel size for the DPI of their screen, once per DPI
+
+Runs on the offscreen platform. Simulated ratios are tested in-process by overriding
+devicePixelRatioF(); real ones run in a child process started with QT_SCALE_FACTOR,
+which has to be set before the QApplication exists.
+"""
+import json
+import os
+import struct
+import subprocess
+import sys
+import tempfile
+import threading
+
+os.environ.setdefault('QT_QPA_PLATFORM', 'offscreen')
+# Never the user's real settings and layouts, APPDATA is always set on Windows
+os.environ['APPDATA'] = tempfile.mkdtemp(prefix='overlay-test-settings-')
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import pytest
+from PyQt5.QtCore import Qt, QSize, QByteArray, QBuffer, QIODevice
+from PyQt5.QtGui import QImage, QPainter, QColor
+from PyQt5.QtWidgets import QApplication
+
+app = QApplication.instance() or QApplication([])
+
+import overlay
+
+RATIOS = [1.0, 1.25, 1.5, 2.0]
+
+
+def make_image(path, width=1200, height=900):
+    image = QImage(width, height, QImage.Format_RGB32)
+    painter = QPainter(image)
+    for i in range(12):
+        painter.fillRect(i * width // 12, 0, width // 12, height, QColor.fromHsv(i * 30, 200, 220))
+    painter.end()
+    image.save(path)
+    return path
+
+
+def simulate_ratio(window, ratio):
+    window.devicePixelRatioF = lambda: ratio
+
+
+@pytest.fixture
+def image_file(tmp_path):
+    return make_image(str(tmp_path / 'source.png'))
+
+
+@pytest.fixture
+def window(image_file):
+    window = overlay.OverlayWindow(image_file, {'width': 301, 'height': 225})
+    yield window
+    window.close()
+
+
+@pytest.mark.parametrize('ratio', RATIOS)
+def test_cached_frame_has_device_pixel_size(window, ratio):
+    simulate_ratio(window, ratio)
+    frame = window.rendered_frame()
+    assert frame.devicePixelRatio() == ratio
+    assert frame.size() == window.size() * ratio
+
+
+@pytest.mark.parametrize('ratio', RATIOS)
+def test_source_is_decoded_for_device_pixels(window, ratio):
+    simulate_ratio(window, ratio)
+    window.rendered_frame()
+    target = window.device_size()
+    assert window.pix.width() >= target.width() and window.pix.height() >= target.height()
+
+
+def test_rerendered_only_when_ratio_changes(window):
+    simulate_ratio(window, 1.0)
+    window.rendered_frame()
+    window.rendered_frame()
+    assert window.render_cache_misses == 1
+
+    # Another screen with the same density keeps the cached frame
+    window.on_screen_changed(None)
+    window.rendered_frame()
+    assert window.render_cache_misses == 1
+
+    simulate_ratio(window, 2.0)
+    window.on_screen_changed(None)
+    assert window.render_cache is None
+    frame = window.rendered_frame()
+    window.rendered_frame()
+    assert window.render_cache_misses == 2
+    assert frame.devicePixelRatio() == 2.0
+
+
+def make_apng(path, colors, width=120, height=90):
+    """Minimal APNG with one solid frame per color, assembled from Qt-encoded PNGs"""
+    chunks = []
+    for i, color in enumerate(colors):
+        image = QImage(width, height, QImage.Format_RGB32)
+        image.fill(color)
+        data = QByteArray()
+        buffer = QBuffer(data)
+        buffer.open(QIODevice.WriteOnly)
+        image.save(buffer, 'PNG')
+        png = bytes(data)
+        offset = 8
+        idat = b''
+        while offset < len(png):
+            length, kind = struct.unpack('>I4s', png[offset:offset + 8])
+            body = png[offset + 8:offset + 8 + length]
+            if kind == b'IHDR' and i == 0:
+                header = body
+            elif kind == b'IDAT':
+                idat += body
+            offset += length + 12
+        chunks.append(overlay.png_chunk(b'fcTL', struct.pack('>IIIIIHHBB', 2 * i, width, height, 0, 0, 5, 100, 0, 0)))
+        if i == 0:
+            chunks.append(overlay.png_chunk(b'IDAT', idat))
+        else:
+            chunks.append(overlay.png_chunk(b'fdAT', struct.pack('>I', 2 * i + 1) + idat))
+    with open(path, 'wb') as f:
+        f.write(overlay.PNG_SIGNATURE + overlay.png_chunk(b'IHDR', header)
+                + overlay.png_chunk(b'acTL', struct.pack('>II', len(colors), 0))
+                + b''.join(chunks) + overlay.png_chunk(b'IEND', b''))
+    return path
+
+
+@pytest.mark.parametrize('cached', [True, False])
+def test_animation_frames_decoded_for_device_pixels(tmp_path, cached):
+    path = make_apng(str(tmp_path / 'frames.png'), [Qt.red, Qt.green, Qt.blue])
+    overlay.gif_frame_cache.enabled = cached
+    window = overlay.OverlayWindow(path, {'width': 120, 'height': 90})
+    try:
+        simulate_ratio(window, 2.0)
+        window.on_screen_changed(None)
+        assert window.frame_cache_size == QSize(240, 180)
+        # A stream still plays the frames it decoded before the change, then switches size
+        for _ in range(overlay.STREAM_BUFFER_FRAMES + 2):
+            window.step_frame()
+        assert window.current_pixmap().size() == QSize(240, 180)
+        assert window.rendered_frame().size() == QSize(240, 180)
+    finally:
+        window.close()
+        overlay.gif_frame_cache.enabled = True
+
+
+def probe(image_path):
+    """Render and paint an overlay at the process' real device pixel ratio, print what happened"""
+    window = overlay.OverlayWindow(image_path, {'width': 301, 'height': 225, 'rotation': 15})
+    window.show()
+    app.processEvents()
+    grabbed = window.grab().toImage().convertToFormat(QImage.Format_ARGB32_Premultiplied)
+    window.grab()
+    cached = window.render_cache
+    print(json.dumps({
+        'ratio': window.devicePixelRatioF(),
+        'cache_size': [cached.width(), cached.height()],
+        'cache_ratio': cached.devicePixelRatio(),
+        'window_size': [window.width(), window.height()],
+        'paint_is_copy': grabbed == cached.toImage().convertToFormat(QImage.Format_ARGB32_Premultiplied),
+        'renders': window.render_cache_misses,
+    }))
+    window.close()
+
+
+@pytest.mark.parametrize('scale', ['1', '1.5', '2'])
+def test_real_scale_factor_paints_cached_frame_unscaled(image_file, scale):
+    env = dict(os.environ, QT_SCALE_FACTOR=scale, QT_QPA_PLATFORM='offscreen')
+    output = subprocess.run([sys.executable, __file__, image_file], env=env, capture_output=True,
+                            text=True, timeout=60, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    ratio = float(scale)
+    assert result['ratio'] == ratio
+    assert result['cache_ratio'] == ratio
+    assert result['cache_size'] == [int(side * ratio + 0.5) for side in result['window_size']]
+    assert result['paint_is_copy']
+    assert result['renders'] == 1
+
+
+def layout_probe(paths):
+    """Load a layout of paths at the process' real device pixel ratio, print how many decodes ran on the GUI thread"""
+    overlay.disk_frame_cache.enabled = False
+    gui_decodes = []
+    for name in ('read_scaled_image', 'read_animation_frames'):
+        def counted(*args, decode=getattr(overlay, name), name=name):
+            if threading.current_thread() is threading.main_thread():
+                gui_decodes.append(name)
+            return decode(*args)
+        setattr(overlay, name, counted)
+
+    controller = overlay.MainWindow(startup_backend=overlay.NoStartup())
+    entries = [{'file': path, 'width': 160, 'height': 120, 'position': [i * 40, 0]} for i, path in enumerate(paths)]
+    overlay.write_json_atomic(controller.layout_path('hidpi'), {'overlays': entries})
+    controller.load_layout('hidpi')
+    while controller.pending_layout is not None:
+        app.processEvents()
+    print(json.dumps({
+        'ratio': app.devicePixelRatio(),
+        'overlays': len(controller.overlays),
+        'gui_decodes': gui_decodes,
+        'frame_cache_states': [window.frame_cache_state for window in controller.overlays if window.isAnimated],
+    }))
+
+
+@pytest.mark.parametrize('scale', ['1', '2'])
+def test_layout_decodes_at_device_size_off_the_gui_thread(tmp_path, scale):
+    paths = [make_image(str(tmp_path / 'first.png')), make_image(str(tmp_path / 'second.png'), 900, 1200),
+             make_apng(str(tmp_path / 'frames.png'), [Qt.red, Qt.green, Qt.blue])]
+    env = dict(os.environ, QT_SCALE_FACTOR=scale, QT_QPA_PLATFORM='offscreen')
+    output = subprocess.run([sys.executable, __file__, '--layout'] + paths, env=env, capture_output=True,
+                            text=True, timeout=60, check=True).stdout
+    result = json.loads(output.strip().splitlines()[-1])
+    assert result['ratio'] == float(scale)
+    assert result['overlays'] == 3
+    assert result['gui_decodes'] == []
+    assert result['frame_cache_states'] == ['cached']
+
+
+if __name__ == '__main__':
+    if sys.argv[1] == '--layout':
+        layout_probe(sys.argv[2:])
+    else:
+        probe(sys.argv[1])